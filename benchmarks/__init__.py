@@ -0,0 +1,7 @@
+"""Performance benchmarks for jinjabread.
+
+These are not part of the test suite: timings depend on the machine, so nothing
+here runs under `python -m unittest`. Run a benchmark module directly, for
+example `python -m benchmarks.prettify`, and compare its JSON results against a
+baseline saved from an earlier release.
+"""
@@ -0,0 +1,289 @@
+"""Benchmark `jinjabread.build` end to end on generated sites.
+
+Generates synthetic projects that vary one parameter at a time from a typical
+site (page count, directory depth, Markdown/HTML mix, share of directories with
+an index page, layout complexity, and static asset volume), then times a full
+build of each in a fresh interpreter and records its peak RSS. The page-count
+series must scale linearly; a fitted exponent above `--max-exponent` fails the
+run, as does a slowdown or memory growth beyond `--tolerance` against a
+`--compare` baseline.
+
+    python -m benchmarks.build --output results/build.json
+    python -m benchmarks.build --compare results/build.json --series pages
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from . import harness
+
+DEFAULTS = {
+    "pages": 200,
+    "depth": 2,
+    "markdown_ratio": 0.5,
+    "index_pages": 1.0,
+    "layout_complexity": 4,
+    "static_files": 20,
+}
+
+SERIES = {
+    "pages": ("pages", [100, 200, 400, 800]),
+    "depth": ("depth", [0, 1, 2, 3, 4]),
+    "markdown": ("markdown_ratio", [0.0, 0.5, 1.0]),
+    "index": ("index_pages", [0.0, 0.5, 1.0]),
+    "layout": ("layout_complexity", [1, 4, 16]),
+    "static": ("static_files", [0, 100, 400]),
+}
+
+STATIC_FILE_SIZE = 16 * 1024
+
+_MARKDOWN_PAGE = """---
+title: Page {i}
+tags: [tag{tag}, common]
+---
+# Page {i}
+
+Some *emphasis*, some **strong** text, and a [link](/). A page about {i}.
+
+- First item
+- Second item with `code`
+
+> A quotation that goes on for a little while, just like real prose does.
+"""
+
+_HTML_PAGE = """<h1>Page {i}</h1>
+<p>Rendered for {{{{ site_name }}}} at {{{{ url_path }}}}.</p>
+<ul>{{% for n in range(5) %}}<li>Item {{{{ n }}}}</li>{{% endfor %}}</ul>
+"""
+
+_INDEX_PAGE = """# {{{{ url_path }}}}
+{{% for page in pages | sort(attribute="url_path") %}}
+- [{{{{ page.title or page.url_path }}}}]({{{{ page.url_path }}}})
+{{% endfor %}}
+"""
+
+_PARTIAL = """<section class="part-{i}">
+  {{% for tag in tags or [] %}}<a href="/tags/{{{{ tag | urlencode }}}}">{{{{ tag | title }}}}</a>{{% endfor %}}
+  {{% if title %}}<h2>{{{{ title | upper }}}} ({i})</h2>{{% endif %}}
+</section>
+"""
+
+_BASE_LAYOUT = """<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8">
+    <title>{% block title %}{{ site_name }}{% endblock %}</title>
+  </head>
+  <body>
+    {% block body %}{% endblock %}
+  </body>
+</html>
+"""
+
+
+def generate_site(
+    project_dir,
+    *,
+    pages,
+    depth,
+    markdown_ratio,
+    index_pages,
+    layout_complexity,
+    static_files,
+):
+    """Write a synthetic project to `project_dir`.
+
+    Content lives in a binary tree of directories `depth` levels deep, with the
+    `pages` pages dealt round-robin among them. A `markdown_ratio` share of the
+    pages are Markdown and the rest HTML, and an `index_pages` share of the
+    directories have an index page listing their siblings. The Markdown layout
+    includes `layout_complexity` partials, and `static_files` files of 16 KiB
+    are copied as static assets. The same parameters always generate the same
+    site.
+    """
+    chooser = random.Random(0)
+    project_dir.mkdir(parents=True)
+    (project_dir / "jinjabread.toml").write_text("""
+[context]
+  site_name = "Benchmark"
+""")
+
+    directories = [Path("content")]
+    for level in range(depth):
+        directories += [
+            directory / f"section{branch}"
+            for directory in directories
+            if len(directory.parts) == level + 1
+            for branch in range(2)
+        ]
+    for directory in directories:
+        (project_dir / directory).mkdir(parents=True)
+    for directory in chooser.sample(directories, round(len(directories) * index_pages)):
+        (project_dir / directory / "index.md").write_text(_INDEX_PAGE.format())
+    for i in range(pages):
+        directory = project_dir / directories[i % len(directories)]
+        if chooser.random() < markdown_ratio:
+            (directory / f"page{i}.md").write_text(
+                _MARKDOWN_PAGE.format(i=i, tag=i % 10)
+            )
+        else:
+            (directory / f"page{i}.html").write_text(_HTML_PAGE.format(i=i))
+
+    partials_dir = project_dir / "layouts" / "partials"
+    partials_dir.mkdir(parents=True)
+    for i in range(layout_complexity):
+        (partials_dir / f"part{i}.html").write_text(_PARTIAL.format(i=i))
+    (project_dir / "layouts" / "base.html").write_text(_BASE_LAYOUT)
+    includes = "\n".join(
+        f'    {{% include "partials/part{i}.html" %}}' for i in range(layout_complexity)
+    )
+    (project_dir / "layouts" / "markdown.html").write_text(
+        '{% extends "base.html" %}\n'
+        "{% block title %}{{ title }} | {{ super() }}{% endblock %}\n"
+        f"{{% block body %}}\n{includes}\n    {{{{ content }}}}\n{{% endblock %}}\n"
+    )
+
+    static_dir = project_dir / "static"
+    static_dir.mkdir()
+    for i in range(static_files):
+        (static_dir / f"asset{i}.bin").write_bytes(chooser.randbytes(STATIC_FILE_SIZE))
+
+
+# Runs in a fresh interpreter so every build starts cold and its peak RSS is its
+# own. Prints the build's wall time and peak RSS as JSON.
+_CHILD = """
+import json, resource, sys, time
+import jinjabread
+
+start = time.perf_counter()
+jinjabread.build(project_dir=sys.argv[1])
+seconds = time.perf_counter() - start
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+scale = 1 if sys.platform == "darwin" else 1024
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+print(json.dumps({"seconds": seconds, "peak_rss_bytes": rss}))
+"""
+
+
+def time_build(project_dir, repeat):
+    """Build `project_dir` `repeat` times; return the fastest time and peak RSS."""
+    runs = []
+    for _ in range(repeat):
+        shutil.rmtree(project_dir / "public", ignore_errors=True)
+        completed = subprocess.run(
+            [sys.executable, "-c", _CHILD, str(project_dir)],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=os.environ | {"PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+        runs.append(json.loads(completed.stdout.splitlines()[-1]))
+    return (
+        min(run["seconds"] for run in runs),
+        max(run["peak_rss_bytes"] for run in runs),
+    )
+
+
+def run_series(name, parameter, values, repeat, work_dir):
+    rows = []
+    for value in values:
+        parameters = DEFAULTS | {parameter: value}
+        project_dir = work_dir / f"{name}-{value}"
+        generate_site(project_dir, **parameters)
+        seconds, peak_rss = time_build(project_dir, repeat)
+        rows.append(
+            {
+                "name": f"{name}/{value}",
+                "parameters": parameters,
+                "seconds": seconds,
+                "peak_rss_bytes": peak_rss,
+                "pages_per_second": parameters["pages"] / seconds,
+            }
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.build", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A previous results file to compare with.")
+    parser.add_argument(
+        "--series",
+        action="append",
+        choices=SERIES,
+        help="Run only this series; repeat to run several (default: all).",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown or memory growth against --compare, as a fraction "
+        "(default: 0.1).",
+    )
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.2,
+        help="Largest fitted scaling exponent of the page-count series accepted "
+        "as linear (default: 1.2).",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "environment": harness.environment("jinjabread", "jinja2", "markdown", "lxml"),
+        "benchmarks": [],
+        "scaling": {},
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.series or SERIES:
+            parameter, values = SERIES[name]
+            rows = run_series(name, parameter, values, args.repeat, Path(work_dir))
+            results["benchmarks"].extend(rows)
+            if parameter == "pages":
+                results["scaling"][name] = harness.scaling_exponent(
+                    [(row["parameters"]["pages"], row["seconds"]) for row in rows]
+                )
+
+    failed = False
+    for row in results["benchmarks"]:
+        print(
+            f"{row['name']:<20} {row['seconds']:8.3f} s "
+            f"{row['pages_per_second']:8.1f} pages/s "
+            f"{row['peak_rss_bytes'] / 1024 / 1024:8.1f} MiB"
+        )
+    for name, exponent in results["scaling"].items():
+        linear = exponent <= args.max_exponent
+        failed = failed or not linear
+        print(
+            f"scaling/{name:<12} exponent {exponent:.2f} {'' if linear else 'NOT LINEAR'}"
+        )
+
+    if args.compare:
+        baseline = harness.load_results(args.compare)
+        for key in ("seconds", "peak_rss_bytes"):
+            for name, before, after, ratio, regressed in harness.compare_results(
+                results, baseline, key=key, tolerance=args.tolerance
+            ):
+                failed = failed or regressed
+                print(
+                    f"{name:<20} {key:<14} {ratio:6.2f}x "
+                    f"{'REGRESSED' if regressed else ''}"
+                )
+
+    if args.output:
+        harness.save_results(results, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Timing, scaling, and result-file helpers shared by the benchmark modules."""
+
+import datetime
+import importlib.metadata
+import json
+import math
+import platform
+import time
+from pathlib import Path
+
+
+def best_time(function, *, repeat=5, number=1):
+    """Return the fastest of `repeat` timings of `number` calls, per call.
+
+    The minimum is the least noisy estimate of what the code itself costs:
+    anything slower was the machine doing something else.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+
+def scaling_exponent(points):
+    """Fit `seconds ~ size ** k` to (size, seconds) points and return `k`.
+
+    A least-squares fit on the log-log points: 1.0 is linear, 2.0 quadratic.
+    """
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(seconds) for _, seconds in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    return numerator / denominator
+
+
+def _version(distribution):
+    try:
+        return importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def environment(*distributions):
+    """Describe the machine and package versions a result set was taken on."""
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {name: _version(name) for name in distributions},
+    }
+
+
+def save_results(results, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
+
+
+def load_results(path):
+    with Path(path).open() as file:
+        return json.load(file)
+
+
+def compare_results(current, baseline, *, key, tolerance):
+    """Compare `key` for every benchmark present in both result sets.
+
+    Returns a list of (name, baseline_value, current_value, ratio, regressed)
+    rows, where `ratio` is current over baseline and a benchmark has regressed
+    when it got more than `tolerance` (a fraction) worse. `key` names a cost,
+    such as seconds, where higher is worse.
+    """
+    previous = {row["name"]: row for row in baseline["benchmarks"]}
+    rows = []
+    for row in current["benchmarks"]:
+        if row["name"] not in previous:
+            continue
+        before = previous[row["name"]][key]
+        after = row[key]
+        ratio = after / before if before else math.inf
+        rows.append((row["name"], before, after, ratio, ratio > 1 + tolerance))
+    return rows
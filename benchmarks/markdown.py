@@ -0,0 +1,151 @@
+"""Benchmark the Markdown backends against each other on the same content.
+
+Converts every `*.md` file under `--content-dir` (by default, the Markdown in
+this repository: the README and the test sites) plus a generated long post with
+each installed backend, and reports throughput and the speedup over the default
+backend. Backends whose dependencies are missing are skipped. A slowdown beyond
+`--tolerance` against a `--compare` baseline fails the run.
+
+    python -m benchmarks.markdown --output results/markdown.json
+    python -m benchmarks.markdown --content-dir mysite/content
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from jinjabread.markdown_backends import MARKDOWN_BACKENDS
+from jinjabread.utils import prettify_html
+
+from . import harness
+
+MEGABYTE = 1024 * 1024
+DEFAULT_BACKEND = "python-markdown"
+
+_SECTION = """
+## Section {i}
+
+Some *emphasis*, some **strong** text, `inline code`, and a [link](/posts/{i}).
+
+- First item
+- Second item with `code`
+
+> A quotation that goes on for a little while, just like real prose does.
+
+    def section_{i}():
+        return {i}
+"""
+
+
+def long_post(sections=200):
+    """A post with front matter and `sections` mixed-markup sections."""
+    body = "".join(_SECTION.format(i=i) for i in range(sections))
+    return f"---\ntitle: Long post\ntags: [a, b]\n---\n# Long post\n{body}"
+
+
+def load_corpus(content_dir):
+    texts = {
+        path.relative_to(content_dir).as_posix(): path.read_text()
+        for path in sorted(content_dir.glob("**/*.md"))
+        if not any(part.startswith(".") for part in path.parts)
+    }
+    texts["generated/long-post.md"] = long_post()
+    return texts
+
+
+def run_backend(name, backend, texts, repeat):
+    size = sum(len(text.encode()) for text in texts.values())
+    seconds = harness.best_time(
+        lambda: [backend.convert(text) for text in texts.values()], repeat=repeat
+    )
+    return {
+        "name": f"backend/{name}",
+        "bytes": size,
+        "documents": len(texts),
+        "seconds": seconds,
+        "mb_per_second": size / MEGABYTE / seconds,
+    }
+
+
+def differing_documents(backend, reference, texts):
+    """Names of the documents two backends render differently, once prettified."""
+    return [
+        name
+        for name, text in texts.items()
+        if prettify_html(backend.convert(text)[0])
+        != prettify_html(reference.convert(text)[0])
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.markdown", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--content-dir",
+        type=Path,
+        default=Path(__file__).parent.parent,
+        help="Benchmark the Markdown files under this directory.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A previous results file to compare with.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown against --compare, as a fraction (default: 0.1).",
+    )
+    args = parser.parse_args(argv)
+
+    texts = load_corpus(args.content_dir)
+    backends = {}
+    for name, backend_class in MARKDOWN_BACKENDS.items():
+        try:
+            backends[name] = backend_class()
+        except ImportError as error:
+            print(f"backend/{name:<16} skipped: {error}")
+
+    results = {
+        "environment": harness.environment("jinjabread", "markdown", "markdown-it-py"),
+        "benchmarks": [
+            run_backend(name, backend, texts, args.repeat)
+            for name, backend in backends.items()
+        ],
+    }
+
+    reference = next(
+        row
+        for row in results["benchmarks"]
+        if row["name"] == f"backend/{DEFAULT_BACKEND}"
+    )
+    for row in results["benchmarks"]:
+        name = row["name"].removeprefix("backend/")
+        speedup = reference["seconds"] / row["seconds"]
+        differing = differing_documents(
+            backends[name], backends[DEFAULT_BACKEND], texts
+        )
+        row["speedup"] = speedup
+        row["differing_documents"] = differing
+        print(
+            f"{row['name']:<24} {row['documents']:>4} docs "
+            f"{row['mb_per_second']:8.2f} MB/s {speedup:6.2f}x "
+            f"{len(differing)} rendered differently"
+        )
+
+    failed = False
+    if args.compare:
+        baseline = harness.load_results(args.compare)
+        for name, before, after, ratio, regressed in harness.compare_results(
+            results, baseline, key="seconds", tolerance=args.tolerance
+        ):
+            failed = failed or regressed
+            print(f"{name:<24} {ratio:6.2f}x {'REGRESSED' if regressed else ''}")
+
+    if args.output:
+        harness.save_results(results, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Benchmark `prettify_html` throughput and how it scales with its input.
+
+Times the pretty-printer over the vendored html5lib corpus and over generated
+inputs that grow in one dimension at a time: overall size, nesting depth, and
+inline-run width. Each series must scale linearly in the bytes it reads and
+writes; a fitted exponent above `--max-exponent` fails the run, as does a
+slowdown beyond `--tolerance` against a `--compare` baseline. (Indentation makes
+the output outgrow the input as nesting deepens, so against the input alone the
+depth series would look superlinear however fast the pretty-printer is.)
+
+    python -m benchmarks.prettify --output results/prettify.json
+    python -m benchmarks.prettify --compare results/prettify.json
+"""
+
+import argparse
+import sys
+
+from jinjabread.utils import prettify_html
+from tests.test_html5lib_corpus import KEPT_INPUTS
+
+from . import harness
+
+MEGABYTE = 1024 * 1024
+
+_PARAGRAPHS = [
+    '<p>So as a form of <a href="/x">nesting</a>, we built our own.</p>',
+    "<p>one <em>two</em> three <strong>four</strong> five</p>",
+    "<ul><li>One</li><li>Two <code>x = 1</code></li></ul>",
+    "<pre>def f():\n    return 1\n</pre>",
+    "<table><tr><td>a</td><td>b <a href='/y'>c</a></td></tr></table>",
+    "<div><!-- note -->after the comment</div>",
+]
+
+
+def sized_document(paragraphs):
+    """A whole document with `paragraphs` mixed block elements in its body."""
+    body = "".join(_PARAGRAPHS[i % len(_PARAGRAPHS)] for i in range(paragraphs))
+    return f"<html><head><title>T</title></head><body>{body}</body></html>"
+
+
+def nested_document(depth):
+    """A fragment of 20 trees, each `depth` blocks deep with a paragraph a level.
+
+    libxml2 stops nesting at 255 levels, so keep `depth` below that.
+    """
+    opening = "".join(f"<div><p>level {i} <em>text</em></p>" for i in range(depth))
+    return (opening + "</div>" * depth) * 20
+
+
+def wide_paragraph(width):
+    """A paragraph whose single inline run is `width` pieces long."""
+    pieces = " ".join(
+        f"word <em>{i}</em> and <a href='/{i}'>link</a>," for i in range(width)
+    )
+    return f"<p>{pieces}</p>"
+
+
+SERIES = {
+    "size": (sized_document, [250, 500, 1000, 2000, 4000]),
+    "depth": (nested_document, [16, 32, 64, 128, 250]),
+    "width": (wide_paragraph, [100, 200, 400, 800, 1600]),
+}
+
+
+def run_corpus(repeat):
+    size = sum(len(text.encode()) for text in KEPT_INPUTS)
+    seconds = harness.best_time(
+        lambda: [prettify_html(text) for text in KEPT_INPUTS], repeat=repeat
+    )
+    return {
+        "name": "corpus/html5lib",
+        "bytes": size,
+        "documents": len(KEPT_INPUTS),
+        "seconds": seconds,
+        "mb_per_second": size / MEGABYTE / seconds,
+    }
+
+
+def run_series(name, generate, parameters, repeat):
+    rows = []
+    for parameter in parameters:
+        text = generate(parameter)
+        size = len(text.encode())
+        output_size = len(prettify_html(text).encode())
+        seconds = harness.best_time(lambda: prettify_html(text), repeat=repeat)
+        rows.append(
+            {
+                "name": f"{name}/{parameter}",
+                "parameter": parameter,
+                "bytes": size,
+                "output_bytes": output_size,
+                "seconds": seconds,
+                "mb_per_second": size / MEGABYTE / seconds,
+            }
+        )
+    exponent = harness.scaling_exponent(
+        [(row["bytes"] + row["output_bytes"], row["seconds"]) for row in rows]
+    )
+    return rows, exponent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.prettify", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A previous results file to compare with.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed slowdown against --compare, as a fraction (default: 0.1).",
+    )
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.2,
+        help="Largest fitted scaling exponent accepted as linear (default: 1.2).",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "environment": harness.environment("jinjabread", "lxml"),
+        "benchmarks": [run_corpus(args.repeat)],
+        "scaling": {},
+    }
+    for name, (generate, parameters) in SERIES.items():
+        rows, exponent = run_series(name, generate, parameters, args.repeat)
+        results["benchmarks"].extend(rows)
+        results["scaling"][name] = exponent
+
+    failed = False
+    for row in results["benchmarks"]:
+        print(
+            f"{row['name']:<20} {row['bytes']:>10} B {row['mb_per_second']:8.2f} MB/s"
+        )
+    for name, exponent in results["scaling"].items():
+        linear = exponent <= args.max_exponent
+        failed = failed or not linear
+        print(
+            f"scaling/{name:<12} exponent {exponent:.2f} {'' if linear else 'NOT LINEAR'}"
+        )
+
+    if args.compare:
+        baseline = harness.load_results(args.compare)
+        for name, before, after, ratio, regressed in harness.compare_results(
+            results, baseline, key="seconds", tolerance=args.tolerance
+        ):
+            failed = failed or regressed
+            print(f"{name:<20} {ratio:6.2f}x {'REGRESSED' if regressed else ''}")
+
+    if args.output:
+        harness.save_results(results, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
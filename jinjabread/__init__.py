@@ -1,5 +1,142 @@
-from .base import *
-from .new import *
-from .build import *
-from .serve import *
-from .config import *
+import importlib
+import sys
+import types
+
+# Each public name, by the module that defines it. Names are imported on first
+# use, so that `import jinjabread`, and with it `python -m jinjabread --help` or
+# `new`, doesn't load jinja2, Markdown, lxml, and werkzeug.
+_EXPORTS = {
+    "base": [
+        "SHARD_MANIFEST",
+        "ASSET_MANIFEST",
+        "CACHE_KEY_DISTRIBUTIONS",
+        "Site",
+        "LazyContext",
+        "PageContext",
+        "PageFactory",
+        "Page",
+        "MarkdownPage",
+    ],
+    "cache": ["MarkdownCache", "PageCache"],
+    "profiling": ["instrument_span", "Profiler", "Tracer"],
+    "new": ["new"],
+    "build": ["build"],
+    "merge": ["merge"],
+    "serve": ["App", "serve"],
+    "config": ["CONFIG_FILENAME", "Config"],
+    "taxonomy": ["slugify", "Taxonomy", "Taxonomies", "TermPage"],
+    "feeds": [
+        "SITEMAP_MAX_URLS",
+        "EMPTY_FEED_UPDATED",
+        "absolute_url",
+        "as_datetime",
+        "SitemapWriter",
+        "write_sitemap_index",
+        "Feed",
+        "FeedWriter",
+        "write_atom",
+        "write_rss",
+    ],
+    "data": [
+        "load_json",
+        "load_toml",
+        "load_csv",
+        "DATA_LOADERS",
+        "DataDirectory",
+    ],
+    "extensions": ["FragmentCache", "FragmentCacheExtension"],
+    "deploy": ["make_deploy_manifest", "write_deploy_manifest"],
+    "memory": ["VirtualPath", "VirtualLoader", "MemorySite", "build_in_memory"],
+    "daemon": [
+        "DAEMON_SOCKET",
+        "DAEMON_BUILD_OPTIONS",
+        "request_build",
+        "print_event",
+        "DaemonServer",
+        "daemon",
+    ],
+    "markdown_backends": [
+        "MarkdownBackend",
+        "PythonMarkdownBackend",
+        "CommonMarkBackend",
+        "MARKDOWN_BACKENDS",
+        "load_markdown_backend",
+    ],
+    "utils": [
+        "INLINE_TAGS",
+        "OPAQUE_TAGS",
+        "COMPACT_TAGS",
+        "VOID_TAGS",
+        "INDENT",
+        "HTML_PARSER",
+        "is_comment_or_pi",
+        "is_inlineable",
+        "escape_attribute",
+        "render_attributes",
+        "inline_pieces",
+        "render_inline_run",
+        "render_inline_element",
+        "partition_into_segments",
+        "render_node",
+        "parse_html",
+        "prettify_html",
+        "prettify_many",
+        "parse_shard",
+        "shard_of",
+        "sort_contexts",
+        "load_page_class",
+        "find_index_file",
+        "parse_front_matter",
+        "split_front_matter",
+        "read_front_matter",
+        "get_temp_path",
+        "link_or_copy",
+        "exchange_paths",
+        "replace_directory",
+        "hash_file",
+    ],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        # A submodule, such as jinjabread.errors.
+        try:
+            return importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            ) from None
+    module_name = _MODULES[name]
+    module = importlib.import_module(f".{module_name}", __name__)
+    for export in _EXPORTS[module_name]:
+        globals()[export] = getattr(module, export)
+    return globals()[name]
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it on this package, which would replace
+        # the new, build, merge, and serve functions with the modules of the
+        # same names. Bind the names the module exports instead.
+        if (
+            isinstance(value, types.ModuleType)
+            and value.__name__ == f"{__name__}.{name}"
+            and name in _EXPORTS
+        ):
+            for export in _EXPORTS[name]:
+                super().__setattr__(export, getattr(value, export))
+            if name in _MODULES:
+                return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __dir__():
+    return sorted({*globals(), *__all__})
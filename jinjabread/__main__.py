@@ -1,16 +1,38 @@
 import argparse
-from . import new, build, serve
 
 
+# Each subcommand imports only what it needs, when it runs.
 def main(action, **options):
     match action:
         case "new":
+            from . import new
+
             new(**options)
 
         case "build":
-            build(**options)
+            if options.pop("daemon", False) or "socket_path" in options:
+                # The client alone, without the build's imports.
+                from .daemon import print_event, request_build
+
+                request_build(on_event=print_event, **options)
+            else:
+                from . import build
+
+                build(**options)
+
+        case "daemon":
+            from . import daemon
+
+            daemon(**options)
+
+        case "merge":
+            from . import merge
+
+            merge(**options)
 
         case "serve":
+            from . import serve
+
             serve(**options)
 
 
@@ -32,6 +54,12 @@ if __name__ == "__main__":
         default=argparse.SUPPRESS,
         help="Optional. The config file",
     )
+    serve_parser.add_argument(
+        "--trace",
+        metavar="TRACE",
+        default=argparse.SUPPRESS,
+        help="Optional. Append Chrome trace events for builds and requests to this file.",
+    )
 
     build_parser = subparsers.add_parser("build", help="Build site.")
     build_parser.add_argument("project_dir", help="The site directory.")
@@ -41,6 +69,97 @@ if __name__ == "__main__":
         default=argparse.SUPPRESS,
         help="Optional. The config file",
     )
+    build_parser.add_argument(
+        "--profile",
+        metavar="REPORT",
+        default=argparse.SUPPRESS,
+        help="Optional. Write per-page stage timings to this JSON file.",
+    )
+    build_parser.add_argument(
+        "--profile-top",
+        metavar="N",
+        type=int,
+        default=argparse.SUPPRESS,
+        help="Optional. How many of the slowest pages to print (default: 10).",
+    )
+    build_parser.add_argument(
+        "--trace",
+        metavar="TRACE",
+        default=argparse.SUPPRESS,
+        help="Optional. Write Chrome trace events for the build to this file.",
+    )
+    build_parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        default=argparse.SUPPRESS,
+        help="Optional. Build only the I-th of N shards of the content.",
+    )
+    build_parser.add_argument(
+        "--deploy-manifest",
+        metavar="MANIFEST",
+        default=argparse.SUPPRESS,
+        help="Optional. Write the files added, changed, and removed since the "
+        "previous manifest to this JSON file.",
+    )
+    build_parser.add_argument(
+        "--daemon",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="Optional. Have the project's running daemon build the site.",
+    )
+    build_parser.add_argument(
+        "--socket",
+        dest="socket_path",
+        metavar="SOCKET",
+        default=argparse.SUPPRESS,
+        help="Optional. Build with the daemon listening on this socket "
+        "(implies --daemon).",
+    )
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Keep the site loaded and build it on request."
+    )
+    daemon_parser.add_argument("project_dir", help="The site directory.")
+    daemon_parser.add_argument(
+        "--config",
+        dest="config_file",
+        default=argparse.SUPPRESS,
+        help="Optional. The config file",
+    )
+    daemon_parser.add_argument(
+        "--socket",
+        dest="socket_path",
+        metavar="SOCKET",
+        default=argparse.SUPPRESS,
+        help="Optional. Listen on this Unix socket "
+        "(default: .jinjabread-daemon.sock in the site directory).",
+    )
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Combine sharded builds into one output directory."
+    )
+    merge_parser.add_argument("project_dir", help="The site directory.")
+    merge_parser.add_argument(
+        "shard_dirs", nargs="+", metavar="shard_dir", help="A shard's output."
+    )
+    merge_parser.add_argument(
+        "--config",
+        dest="config_file",
+        default=argparse.SUPPRESS,
+        help="Optional. The config file",
+    )
+    merge_parser.add_argument(
+        "--deploy-manifest",
+        metavar="MANIFEST",
+        default=argparse.SUPPRESS,
+        help="Optional. Write the files added, changed, and removed since the "
+        "previous manifest to this JSON file.",
+    )
 
     args = parser.parse_args()
+    if args.action == "build" and ("daemon" in args or "socket_path" in args):
+        for name in ["profile", "profile_top", "trace"]:
+            if name in args:
+                option = "--" + name.replace("_", "-")
+                parser.error(f"{option} can't be used with --daemon or --socket")
     main(**vars(args))
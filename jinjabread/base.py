@@ -1,63 +1,705 @@
+import asyncio
+import collections
+import collections.abc
+import concurrent.futures
+import contextvars
+import copy
+import dataclasses
+import filecmp
+import hashlib
+import importlib.metadata
+import json
 import mimetypes
+import os
 from pathlib import Path
 import shutil
-from jinja2 import Environment, FileSystemLoader
-import markdown
+import threading
+import jinja2.meta
+import jinja2.nodes
+from jinja2 import Environment, FileSystemLoader, TemplateError
 
 from . import errors
-from .utils import prettify_html, find_index_file
+from .cache import MarkdownCache, PageCache
+from .data import DataDirectory
+from .extensions import FragmentCache, FragmentCacheExtension
+from .feeds import FeedWriter, SitemapWriter
+from .markdown_backends import load_markdown_backend
+from .profiling import instrument_span
+from .utils import (
+    prettify_html,
+    find_index_file,
+    get_temp_path,
+    hash_file,
+    link_or_copy,
+    replace_directory,
+    shard_of,
+    sort_contexts,
+)
+
+SHARD_MANIFEST = ".jinjabread-shard.json"
+ASSET_MANIFEST = "asset-manifest.json"
+
+# Distributions whose version can change a page's output.
+CACHE_KEY_DISTRIBUTIONS = [
+    "jinjabread",
+    "jinja2",
+    "lxml",
+    "markdown",
+    "markdown-full-yaml-metadata",
+    "markdown-it-py",
+]
+
+
+def _version(distribution):
+    try:
+        return importlib.metadata.version(distribution)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _json_default(value):
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
 class Site:
-    def __init__(self, config):
+    def __init__(self, config, *, instruments=(), shard=None):
         self.config = config
+        # Observers of the build's stages, such as a Profiler.
+        self.instruments = list(instruments)
+        # Build only this (index, count) share of the content; see shard_of().
+        self.shard = shard
+        self.outputs = []
+        # The URL path of each page, by its file path.
+        self.url_paths = {}
+        # While building into a staging directory, the output directory the
+        # previous build left, to compare new outputs with.
+        self.live_output_dir = None
         self.env = Environment(
-            loader=FileSystemLoader(
-                searchpath=[
-                    self.config.layouts_dir,
-                    self.config.content_dir,
-                ],
-            ),
+            loader=self.make_loader(),
+            enable_async=self.config.async_render,
+            extensions=[FragmentCacheExtension],
         )
+        # Renders templates that a template on the build's event loop needs
+        # synchronously; see render_template().
+        self.render_thread = None
+        if self.config.async_render:
+            self.render_thread = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Set on the threads that render_template() renders on.
+        self.render_local = threading.local()
+        # Let `tojson` serialize the lazy page contexts in index listings.
+        self.env.policies["json.dumps_kwargs"] = {
+            "sort_keys": True,
+            "default": _json_default,
+        }
+        self.markdown_cache = None
+        if self.config.markdown_cache:
+            self.markdown_cache = MarkdownCache(
+                self.config.cache_dir / "markdown.sqlite3",
+                max_size=self.config.markdown_cache_max_size,
+            )
+        self.page_cache = None
+        if self.config.page_cache:
+            self.page_cache = PageCache(self.config.page_cache_dir)
+            self.config_digest = self.get_config_digest()
+        self.template_digests = {}
+        self.file_digests = {}
+        self.sitemap = None
+        self.feed_writers = []
+        # Each static file's name, relative to the static directory, and the
+        # name it is published under; see get_assets().
+        self.assets = None
+        self.env.globals["asset"] = self.asset
+        self.env.filters["asset"] = self.asset
+        self.reset_taxonomies()
+        self.reset_data()
+        self.reset_fragments()
+
+    def make_loader(self):
+        # Layouts first, so a layout wins over a content file of the same name.
+        return FileSystemLoader(
+            searchpath=[
+                self.config.layouts_dir,
+                self.config.content_dir,
+            ],
+        )
+
+    def span(self, name, content_path=None):
+        if content_path is not None and self.instruments:
+            content_path = content_path.relative_to(self.config.content_dir).as_posix()
+        return instrument_span(self.instruments, name, content_path)
+
+    def iter_span(self, name, content_path, iterable):
+        # Time the work done producing each item of a lazy iterable, such as a
+        # stream of rendered chunks, as a span of its own.
+        if not self.instruments:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        done = object()
+        while True:
+            with self.span(name, content_path):
+                item = next(iterator, done)
+            if item is done:
+                return
+            yield item
+
+    def reset_taxonomies(self):
+        # Imported here because the taxonomy module builds on this one.
+        from .taxonomy import Taxonomies
+
+        self.taxonomies = Taxonomies(self)
+        self.env.globals["taxonomies"] = self.taxonomies
+
+    def reset_data(self):
+        # Data files are parsed at most once per build, by the first page that
+        # reads them.
+        self.data = DataDirectory(self.config.data_dir)
+        self.env.globals["data"] = self.data
+        self.data_digest = None
+
+    def reset_fragments(self):
+        # `{% cache %}` fragments are rendered once per build, and kept across
+        # builds in the page cache; see FragmentCache.
+        self.fragment_cache = FragmentCache(self)
+        self.env.fragment_cache = self.fragment_cache
+
+    def get_assets(self):
+        if self.assets is None:
+            self.assets = {}
+            static_dir = self.config.static_dir
+            paths = sorted(static_dir.glob("**/*")) if static_dir.exists() else []
+            for path in paths:
+                if not path.is_file():
+                    continue
+                name = path.relative_to(static_dir).as_posix()
+                if self.config.fingerprint_static:
+                    # app.css becomes app.3f9c1a2b.css.
+                    fingerprint = hash_file(path)[:8]
+                    published_path = Path(name)
+                    self.assets[name] = published_path.with_name(
+                        f"{published_path.stem}.{fingerprint}{published_path.suffix}"
+                    ).as_posix()
+                else:
+                    self.assets[name] = name
+        return self.assets
+
+    def asset(self, name):
+        # The URL path of a static file, fingerprinted if fingerprint_static is
+        # set: `{{ asset("app.css") }}` or `{{ "app.css"|asset }}`.
+        try:
+            published_name = self.get_assets()[name]
+        except KeyError:
+            raise errors.AssetNotFoundError(f"Static file not found: {name}") from None
+        return f"/{self.config.static_dir.name}/{published_name}"
+
+    def get_config_digest(self):
+        # The settings and package versions that every page's output depends on.
+        data = {
+            "context": self.config.context,
+            "prettify_html": self.config.prettify_html,
+            "pages": [
+                [
+                    f"{factory.page_class.__module__}.{factory.page_class.__qualname__}",
+                    factory.page_initkwargs,
+                ]
+                for factory in self.config.page_factories
+            ],
+            "taxonomies": [vars(taxonomy) for taxonomy in self.config.taxonomies],
+            "versions": {name: _version(name) for name in CACHE_KEY_DISTRIBUTIONS},
+        }
+        return json.dumps(data, sort_keys=True, default=str)
+
+    def digest_template(self, template_name):
+        # A digest of a template's source and of every template it extends,
+        # includes, or imports, or None if that can't be known statically. A
+        # template that reads `taxonomies` depends on every content file too,
+        # one that reads `data` on every data file, and one that calls `asset`
+        # on the static files' published names.
+        if template_name in self.template_digests:
+            return self.template_digests[template_name]
+        # Stays None for a template that references itself, directly or not.
+        self.template_digests[template_name] = None
+        try:
+            source, _, _ = self.env.loader.get_source(self.env, template_name)
+            ast = self.env.parse(source)
+            digest = hashlib.sha256(source.encode())
+            for reference in jinja2.meta.find_referenced_templates(ast):
+                reference_digest = reference and self.digest_template(reference)
+                if reference_digest is None:
+                    return None
+                digest.update(reference_digest)
+            # find_undeclared_variables leaves out globals such as these.
+            names = {node.name for node in ast.find_all(jinja2.nodes.Name)}
+            if self.config.taxonomies and "taxonomies" in names:
+                tree_digest = self.digest_tree(self.config.content_dir)
+                if tree_digest is None:
+                    return None
+                digest.update(tree_digest)
+            if "data" in names:
+                digest.update(self.digest_data())
+            filters = {node.name for node in ast.find_all(jinja2.nodes.Filter)}
+            if "asset" in names or "asset" in filters:
+                digest.update(json.dumps(self.get_assets(), sort_keys=True).encode())
+        except (TemplateError, UnicodeDecodeError):
+            return None
+        self.template_digests[template_name] = digest.digest()
+        return self.template_digests[template_name]
+
+    def digest_file(self, content_path):
+        # A digest of a content file as its siblings' index page sees it.
+        if content_path not in self.file_digests:
+            if not self.is_page_path(content_path):
+                digest = hashlib.sha256(content_path.read_bytes()).digest()
+            else:
+                digest = self.digest_template(
+                    content_path.relative_to(self.config.content_dir).as_posix()
+                )
+            self.file_digests[content_path] = digest
+        return self.file_digests[content_path]
+
+    def digest_data(self):
+        # A digest of every file in the data directory.
+        if self.data_digest is None:
+            digest = hashlib.sha256()
+            data_dir = self.config.data_dir
+            paths = sorted(data_dir.glob("**/*")) if data_dir.exists() else []
+            for path in paths:
+                relative_path = path.relative_to(data_dir)
+                if path.is_dir() or any(
+                    part.startswith(".") for part in relative_path.parts
+                ):
+                    continue
+                digest.update(
+                    relative_path.as_posix().encode() + b"\0" + hash_file(path).encode()
+                )
+            self.data_digest = digest.digest()
+        return self.data_digest
+
+    def digest_tree(self, directory):
+        # A digest of every file an index page in `directory` may list.
+        digest = hashlib.sha256()
+        for path in sorted(directory.glob("**/*")):
+            relative_path = path.relative_to(self.config.content_dir)
+            if path.is_dir() or any(
+                part.startswith(".") for part in relative_path.parts
+            ):
+                continue
+            file_digest = self.digest_file(path)
+            if file_digest is None:
+                return None
+            digest.update(relative_path.as_posix().encode() + b"\0" + file_digest)
+        return digest.digest()
 
     def render_template(self, template_name, **context):
         template = self.env.get_template(template_name)
+        if self.env.is_async and _in_event_loop():
+            # Called synchronously from a template rendering on the build's
+            # event loop, such as for a listed page's content. Jinja renders an
+            # async template synchronously on an event loop of its own, which
+            # this thread can't start, so render it on another thread.
+            render = contextvars.copy_context().run
+            if not getattr(self.render_local, "active", False):
+                return self.render_thread.submit(
+                    render, self._render_off_loop, template, context
+                ).result()
+            # Nested in a render on the render thread, such as a listed page's
+            # content listing pages of its own. The render thread's one worker
+            # is busy waiting for this, so render on a thread of its own.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                return executor.submit(
+                    render, self._render_off_loop, template, context
+                ).result()
+        return template.render(context)
+
+    def _render_off_loop(self, template, context):
+        self.render_local.active = True
         return template.render(context)
 
+    async def render_template_async(self, template_name, **context):
+        template = self.env.get_template(template_name)
+        return await template.render_async(context)
+
+    def stream_template(self, template_name, **context):
+        template = self.env.get_template(template_name)
+        return template.generate(context)
+
     def match_page(self, path):
-        for page_factory in self.config.page_factories:
-            page = page_factory.make_page(self, path)
-            if path.match(page.glob_pattern):
-                return page
+        with self.span("match", path):
+            for page_factory in self.config.page_factories:
+                page = page_factory.make_page(self, path)
+                if path.match(page.glob_pattern):
+                    return page
         raise errors.PageNotMatchedError(f"No page matched: {path.as_posix()}")
 
+    def in_shard(self, content_path):
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        relative_path = content_path.relative_to(self.config.content_dir)
+        return shard_of(relative_path.as_posix(), count) == index
+
+    def record_output(self, output_path):
+        self.outputs.append(output_path)
+
+    def open_feeds(self):
+        if (self.config.sitemap or self.config.feeds) and not self.config.base_url:
+            raise errors.FeedError("Set base_url to generate a sitemap or feeds.")
+        self.sitemap = None
+        if self.config.sitemap:
+            # Each shard writes its own numbered sitemaps, for merge to list.
+            prefix = "sitemap" if self.shard is None else f"sitemap-{self.shard[0]}"
+            self.sitemap = SitemapWriter(
+                self.config.output_dir,
+                base_url=self.config.base_url,
+                max_urls=self.config.sitemap_max_urls,
+                prefix=prefix,
+                install=self.install_output,
+            )
+        self.feed_writers = [FeedWriter(feed) for feed in self.config.feeds]
+
+    def record_page(self, page):
+        # The sitemap and feeds are filled in as pages are generated, rather
+        # than by a template that lists every page.
+        url_path = page.get_url_path()
+        self.url_paths[page.get_file_path()] = url_path
+        if self.sitemap is not None and page.output_path.suffix == ".html":
+            self.sitemap.add(url_path)
+        for feed_writer in self.feed_writers:
+            feed_writer.add_page(page)
+
+    def close_feeds(self):
+        if self.sitemap is not None:
+            for path in self.sitemap.close(index=self.shard is None):
+                self.record_output(path)
+        # A shard's feed entries go in its manifest, for merge to write.
+        if self.shard is None:
+            for feed_writer in self.feed_writers:
+                self.record_output(
+                    feed_writer.write(
+                        self.config.output_dir,
+                        base_url=self.config.base_url,
+                        install=self.install_output,
+                    )
+                )
+
+    def abort_feeds(self):
+        # A failed build leaves no half-written sitemap behind.
+        if self.sitemap is not None:
+            self.sitemap.abort()
+
+    def get_previous_path(self, output_path):
+        # Where the previous build left `output_path`.
+        if self.live_output_dir is None:
+            return output_path
+        return self.live_output_dir / output_path.relative_to(self.config.output_dir)
+
+    def keep_previous(self, output_path):
+        previous_path = self.get_previous_path(output_path)
+        if previous_path != output_path:
+            link_or_copy(previous_path, output_path)
+
+    def install_output(self, temp_path, output_path):
+        # Move a newly written output into place in one rename, unless the
+        # previous build wrote the same bytes. Then keep that file, and its
+        # mtime, so rsync and CDN uploads can skip it.
+        previous_path = self.get_previous_path(output_path)
+        if previous_path.is_file() and filecmp.cmp(
+            temp_path, previous_path, shallow=False
+        ):
+            os.unlink(temp_path)
+            self.keep_previous(output_path)
+        else:
+            os.replace(temp_path, output_path)
+
+    def copy_output(self, source, output_path):
+        # Like install_output, for a file copied as it is. Copies keep their
+        # source's mtime, so an unchanged file is usually told by its size and
+        # mtime alone.
+        previous_path = self.get_previous_path(output_path)
+        if previous_path.is_file() and filecmp.cmp(source, previous_path):
+            self.keep_previous(output_path)
+        else:
+            temp_path = get_temp_path(output_path)
+            shutil.copy2(source, temp_path)
+            os.replace(temp_path, output_path)
+        self.record_output(output_path)
+
+    def copy_static_dir(self):
+        # Static files are published under their own names and, fingerprinted,
+        # under their published names as well, so files that refer to each
+        # other by relative URL, such as a stylesheet and its fonts, still work.
+        output_dir = self.config.output_dir / self.config.static_dir.name
+        for name, published_name in self.get_assets().items():
+            for output_name in {name, published_name}:
+                output_path = output_dir / output_name
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                self.copy_output(self.config.static_dir / name, output_path)
+        if self.config.fingerprint_static:
+            output_path = output_dir / ASSET_MANIFEST
+            temp_path = get_temp_path(output_path)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            with temp_path.open("w") as file:
+                json.dump(self.get_assets(), file, indent=2, sort_keys=True)
+                file.write("\n")
+            self.install_output(temp_path, output_path)
+            self.record_output(output_path)
+
+    def get_output_names(self):
+        # The files the build wrote, relative to the output directory.
+        return sorted(
+            path.relative_to(self.config.output_dir).as_posix() for path in self.outputs
+        )
+
+    def write_shard_manifest(self):
+        index, count = self.shard
+        self.config.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            "shard": index,
+            "shards": count,
+            "files": self.get_output_names(),
+            "url_paths": self.url_paths,
+        }
+        if self.sitemap is not None:
+            manifest["sitemaps"] = [
+                path.relative_to(self.config.output_dir).as_posix()
+                for path in self.sitemap.paths
+            ]
+        if self.feed_writers:
+            manifest["feeds"] = {
+                feed_writer.feed.path: feed_writer.dump_entries()
+                for feed_writer in self.feed_writers
+            }
+        with (self.config.output_dir / SHARD_MANIFEST).open("w") as file:
+            json.dump(manifest, file)
+
     def generate(self):
+        self.outputs = []
+        self.url_paths = {}
+        self.assets = None
+        self.template_digests = {}
+        self.file_digests = {}
+        self.reset_taxonomies()
+        self.reset_data()
+        self.reset_fragments()
+        if not self.config.staged_output:
+            self._build()
+            return
+        # Build into a fresh staging directory beside the output directory, then
+        # swap it into place, so a failed build leaves the last one untouched.
+        live_config = self.config
+        output_dir = live_config.output_dir
+        staging_dir = output_dir.with_name(f".{output_dir.name}.staging")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+        self.config = dataclasses.replace(live_config, output_dir=staging_dir)
+        self.live_output_dir = output_dir
+        try:
+            self._build()
+        finally:
+            self.config = live_config
+            self.live_output_dir = None
+        replace_directory(staging_dir, output_dir)
+        self.outputs = [
+            output_dir / path.relative_to(staging_dir) for path in self.outputs
+        ]
+
+    def _build(self):
+        with self.span("build"):
+            self.open_feeds()
+            try:
+                self._generate()
+            except BaseException:
+                self.abort_feeds()
+                raise
+            self.close_feeds()
+        if self.shard is not None:
+            self.write_shard_manifest()
+
+    def close(self):
+        # Release what the site keeps open between builds.
+        if self.markdown_cache is not None:
+            self.markdown_cache.close()
+        if self.render_thread is not None:
+            self.render_thread.shutdown()
+
+    def iter_content_paths(self):
         for content_path in self.config.content_dir.glob("**/*"):
             if content_path.is_dir():
                 continue
             # Ignore hidden files and directories.
             if any(part.startswith(".") for part in content_path.parts):
                 continue
-            mime_type, _ = mimetypes.guess_type(content_path.name)
-            if mime_type and not mime_type.startswith("text/"):
+            yield content_path
+
+    def is_page_path(self, content_path):
+        # Binary files are copied as they are rather than rendered.
+        mime_type, _ = mimetypes.guess_type(content_path.name)
+        return not mime_type or mime_type.startswith("text/")
+
+    def find_pages(self):
+        for content_path in self.iter_content_paths():
+            if not self.is_page_path(content_path):
+                continue
+            try:
+                yield self.match_page(content_path)
+            except errors.PageNotMatchedError:
+                continue
+
+    def _generate(self):
+        pages = self.iter_build_pages()
+        if self.config.async_render:
+            asyncio.run(self.generate_pages_async(pages))
+        else:
+            for page in pages:
+                page.generate()
+
+        # Static files are copied once, by the first shard.
+        if self.shard is not None and self.shard[0] != 1:
+            return
+
+        if self.config.static_dir.exists():
+            with self.span("static"):
+                self.copy_static_dir()
+
+    def iter_build_pages(self):
+        # The pages to generate, in order. Content files that aren't pages are
+        # copied along the way.
+        content_paths = self.iter_content_paths()
+        for content_path in self.iter_span("scan", None, content_paths):
+            if not self.in_shard(content_path):
+                continue
+            if not self.is_page_path(content_path):
                 output_path = self.config.output_dir / content_path.relative_to(
                     self.config.content_dir
                 )
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy(content_path, output_path)
+                with self.span("static"):
+                    output_path.parent.mkdir(parents=True, exist_ok=True)
+                    self.copy_output(content_path, output_path)
                 continue
             try:
-                page = self.match_page(content_path)
+                yield self.match_page(content_path)
             except errors.PageNotMatchedError:
                 continue
-            page.generate()
 
-        if self.config.static_dir.exists():
-            shutil.copytree(
-                self.config.static_dir,
-                self.config.output_dir / self.config.static_dir.name,
-                dirs_exist_ok=True,
-            )
+        # Term pages are generated once, by the first shard.
+        if self.shard is not None and self.shard[0] != 1:
+            return
+
+        for taxonomy in self.config.taxonomies:
+            if taxonomy.layout_name is None:
+                continue
+            for term in self.taxonomies[taxonomy.name].values():
+                yield taxonomy.make_term_page(self, term)
+
+    async def generate_pages_async(self, pages):
+        # Render up to async_concurrency pages at once, so a page awaiting a
+        # data loader doesn't hold up the others, but record each page in
+        # order, so outputs, the sitemap, and feeds are those of a sync build.
+        pending = collections.deque()
+
+        async def finish_oldest():
+            page = pending[0][0]
+            await pending.popleft()[1]
+            self.record_output(page.output_path)
+            self.record_page(page)
+
+        try:
+            for page in pages:
+                copies = page.paginate() if page.should_paginate() else [page]
+                for page_copy in copies:
+                    task = asyncio.ensure_future(page_copy.generate_async())
+                    pending.append((page_copy, task))
+                    if len(pending) >= self.config.async_concurrency:
+                        await finish_oldest()
+            while pending:
+                await finish_oldest()
+        finally:
+            # Let the cancelled pages clean up before the loop closes.
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class LazyContext(dict):
+    """A page context whose expensive values are computed on first access.
+
+    `loaders` maps each deferred key to a function that computes its value.
+    Templates read a deferred key like any other (`page.content`), and it is
+    computed once, then stored. Until then it is not among the dict's items.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loaders = {}
+
+    def __missing__(self, key):
+        if key not in self.loaders:
+            raise KeyError(key)
+        value = self[key] = self.loaders.pop(key)()
+        return value
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.loaders
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+
+class PageContext(collections.abc.Mapping):
+    """A listed page's context, evaluated the first time it is needed.
+
+    `file_path` and `url_path` are known without evaluating the page (see
+    Page.get_listing_paths), so sorting or linking by them is cheap, and they
+    are the same before and after the page is evaluated. Reading any other
+    variable evaluates the page's listing context once and keeps it, so a
+    template that shows five of a thousand pages evaluates five.
+    """
+
+    def __init__(self, page):
+        self._page = page
+        self._paths = None
+        self._context = None
+
+    def _get_paths(self):
+        if self._paths is None:
+            self._paths = self._page.get_listing_paths()
+        return self._paths
+
+    def _evaluate(self):
+        if self._context is None:
+            self._context = self._page.get_listing_context()
+        return self._context
+
+    def __getitem__(self, key):
+        paths = self._get_paths()
+        if key in paths:
+            return paths[key]
+        return self._evaluate()[key]
+
+    def __contains__(self, key):
+        return key in self._get_paths() or key in self._evaluate()
+
+    def __iter__(self):
+        paths = self._get_paths()
+        yield from paths
+        yield from (key for key in self._evaluate() if key not in paths)
+
+    def __len__(self):
+        paths = self._get_paths()
+        return len(paths) + sum(key not in paths for key in self._evaluate())
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class PageFactory:
@@ -72,9 +714,34 @@ class PageFactory:
 
 
 class Page:
-    def __init__(self, *, glob_pattern=None, context=None):
+    def __init__(
+        self,
+        *,
+        glob_pattern=None,
+        context=None,
+        paginate_by=None,
+        paginate_path="page/{number}",
+        paginate_sort=None,
+        paginate_reverse=False,
+    ):
+        if paginate_by is not None and (
+            not isinstance(paginate_by, int)
+            or isinstance(paginate_by, bool)
+            or paginate_by < 1
+        ):
+            raise errors.PaginationError(
+                f"Invalid paginate_by: {paginate_by!r} (must be a positive integer)"
+            )
         self.glob_pattern = glob_pattern or "**/*"
         self.context = context or {}
+        self.paginate_by = paginate_by
+        self.paginate_path = paginate_path
+        self.paginate_sort = paginate_sort
+        self.paginate_reverse = paginate_reverse
+        # The slice of the listing, and where it falls, that this copy of an
+        # index page renders; see paginate().
+        self.pagination = None
+        self.paginated_pages = None
 
     def setup(self, site, content_path):
         self.site = site
@@ -91,7 +758,8 @@ class Page:
 
     def _get_sibling_context_list(self):
         context_list = []
-        for path in self.content_path.parent.iterdir():
+        # Sorted, so every machine lists siblings in the same order.
+        for path in sorted(self.content_path.parent.iterdir()):
             if path == self.content_path:
                 continue
             # Ignore hidden files and directories.
@@ -103,54 +771,225 @@ class Page:
                     page = self.site.match_page(index_path)
                 except (FileNotFoundError, errors.PageNotMatchedError):
                     continue
-                context_list.append(page.get_context())
+                context_list.append(PageContext(page))
                 continue
             try:
                 page = self.site.match_page(path)
             except errors.PageNotMatchedError:
                 continue
-            context_list.append(page.get_context())
+            context_list.append(PageContext(page))
         return context_list
 
-    def get_context(self):
+    def get_file_path(self):
+        return self.output_path.relative_to(self.site.config.output_dir).as_posix()
+
+    def get_url_path(self):
         relative_path = self.output_path.relative_to(self.site.config.output_dir)
         if not relative_path.stem == "index":
-            url_path = "/" + relative_path.with_suffix("").as_posix()
+            return "/" + relative_path.with_suffix("").as_posix()
         elif not relative_path.parent.name:
-            url_path = "/"
+            return "/"
         else:
-            url_path = "/" + relative_path.parent.as_posix() + "/"
-        context = (
+            return "/" + relative_path.parent.as_posix() + "/"
+
+    def get_default_context(self):
+        return (
             self.site.config.context
             | self.context
             | {
-                "file_path": relative_path.as_posix(),
-                "url_path": url_path,
+                "file_path": self.get_file_path(),
+                "url_path": self.get_url_path(),
             }
         )
-        if self.content_path.stem == "index":
+
+    def get_context(self):
+        context = self.get_default_context()
+        if self.pagination is not None:
+            context["pages"] = self.paginated_pages
+            context["pagination"] = self.pagination
+        elif self.content_path.stem == "index":
             context["pages"] = self._get_sibling_context_list()
         return context
 
+    def should_paginate(self):
+        return self.paginate_by is not None and self.content_path.stem == "index"
+
+    def paginate(self):
+        # Yield a copy of this index page for each `paginate_by` pages of its
+        # listing. The listing is sorted once, then sliced.
+        pages = self._get_sibling_context_list()
+        if self.paginate_sort is not None:
+            pages = sort_contexts(
+                pages, self.paginate_sort, reverse=self.paginate_reverse
+            )
+        count = max(1, -(-len(pages) // self.paginate_by))
+        copies = []
+        for number in range(1, count + 1):
+            page = copy.copy(self)
+            if number > 1:
+                page.output_path = (
+                    self.output_path.parent
+                    / self.paginate_path.format(number=number)
+                    / self.output_path.name
+                )
+            copies.append(page)
+        urls = [page.get_url_path() for page in copies]
+        for number, page in enumerate(copies, start=1):
+            start = (number - 1) * self.paginate_by
+            page.paginated_pages = pages[start : start + self.paginate_by]
+            page.pagination = {
+                "number": number,
+                "count": count,
+                "per_page": self.paginate_by,
+                "total": len(pages),
+                "urls": urls,
+                "previous_url": urls[number - 2] if number > 1 else None,
+                "next_url": urls[number] if number < count else None,
+            }
+            yield page
+
+    def get_listing_context(self):
+        # The context this page contributes to an index page's `pages` list.
+        return self.get_context()
+
+    def get_listing_paths(self):
+        # The `file_path` and `url_path` an index page lists this page with,
+        # known without rendering it.
+        return {"file_path": self.get_file_path(), "url_path": self.get_url_path()}
+
+    def get_metadata(self):
+        # The variables this page sets without being rendered, which group it
+        # into taxonomies.
+        return self.site.config.context | self.context
+
+    def should_prettify(self):
+        return self.site.config.prettify_html and self.output_path.suffix == ".html"
+
     def render(self):
         template_name = self.get_template_name()
-        text = self.site.render_template(template_name, **self.get_context())
-        if self.site.config.prettify_html and self.output_path.suffix == ".html":
-            return prettify_html(text)
+        with self.site.span("render", self.content_path):
+            text = self.site.render_template(template_name, **self.get_context())
+        return self.finish_render(text)
+
+    async def render_async(self):
+        # Like render, on the build's event loop, for async_render.
+        template_name = self.get_template_name()
+        with self.site.span("render", self.content_path):
+            context = await self.get_context_async()
+            text = await self.site.render_template_async(template_name, **context)
+        return self.finish_render(text)
+
+    async def get_context_async(self):
+        return self.get_context()
+
+    def finish_render(self, text):
+        if self.should_prettify():
+            with self.site.span("prettify", self.content_path):
+                return prettify_html(text)
         return text
 
+    def stream(self):
+        # Yield the output in chunks as Jinja renders it, so output that needs no
+        # prettifying never has to be held in memory whole.
+        template_name = self.get_template_name()
+        with self.site.span("render", self.content_path):
+            chunks = self.site.stream_template(template_name, **self.get_context())
+        return self.site.iter_span("render", self.content_path, chunks)
+
+    def get_template_names(self):
+        # Every template the page renders, to key its cached output by.
+        return [self.get_template_name()]
+
+    def get_cache_key(self):
+        # A hash of everything the page's output depends on, or None if that
+        # can't be known statically.
+        digest = hashlib.sha256(self.site.config_digest.encode())
+        digest.update(self.get_file_path().encode() + b"\0")
+        for template_name in self.get_template_names():
+            template_digest = self.site.digest_template(template_name)
+            if template_digest is None:
+                return None
+            digest.update(template_digest)
+        if self.content_path.stem == "index":
+            tree_digest = self.site.digest_tree(self.content_path.parent)
+            if tree_digest is None:
+                return None
+            digest.update(tree_digest)
+        return digest.hexdigest()
+
+    def write(self):
+        chunks = [self.render()] if self.should_prettify() else self.stream()
+        self.write_chunks(chunks)
+
+    async def write_async(self):
+        self.write_chunks([await self.render_async()])
+
+    def write_chunks(self, chunks):
+        # Written beside the output and renamed into place, so a failed build
+        # never leaves a half-written file.
+        temp_path = get_temp_path(self.output_path)
+        with self.site.span("write", self.content_path):
+            try:
+                with temp_path.open("w") as file:
+                    file.writelines(chunks)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+            self.site.install_output(temp_path, self.output_path)
+
     def generate(self):
-        text = self.render()
-        self.output_path.parent.mkdir(parents=True, exist_ok=True)
-        with self.output_path.open("w") as file:
-            file.write(text)
+        if self.should_paginate() and self.pagination is None:
+            for page in self.paginate():
+                page.generate()
+            return
+        with self.site.span("generate", self.content_path):
+            cache = self.site.page_cache
+            key = self.get_cache_key() if cache is not None else None
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = get_temp_path(self.output_path)
+            if key is not None and cache.load(key, temp_path):
+                self.site.install_output(temp_path, self.output_path)
+            else:
+                self.write()
+                if key is not None:
+                    cache.save(key, self.output_path)
+            self.site.record_output(self.output_path)
+            self.site.record_page(self)
+
+    async def generate_async(self):
+        # Like generate, on the build's event loop, for one page or one copy
+        # of a paginated index page. The site records the page; see
+        # Site.generate_pages_async().
+        with self.site.span("generate", self.content_path):
+            cache = self.site.page_cache
+            key = self.get_cache_key() if cache is not None else None
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = get_temp_path(self.output_path)
+            if key is not None and cache.load(key, temp_path):
+                self.site.install_output(temp_path, self.output_path)
+            else:
+                await self.write_async()
+                if key is not None:
+                    cache.save(key, self.output_path)
 
 
 class MarkdownPage(Page):
 
-    def __init__(self, *, layout_name, glob_pattern=None, **kwargs):
+    def __init__(
+        self,
+        *,
+        layout_name,
+        glob_pattern=None,
+        backend="python-markdown",
+        extensions=None,
+        front_matter_listing=False,
+        jinja=True,
+        **kwargs,
+    ):
         self.layout_name = layout_name
-        self.markdown = markdown.Markdown(extensions=["full_yaml_metadata"])
+        self.jinja = jinja
+        self.front_matter_listing = front_matter_listing
+        self.backend = load_markdown_backend(backend)(extensions=extensions)
         super().__init__(glob_pattern=glob_pattern or "**/*.md", **kwargs)
 
     def get_output_path(self):
@@ -159,14 +998,93 @@ class MarkdownPage(Page):
     def get_template_name(self):
         return self.layout_name
 
+    def get_template_names(self):
+        content_name = self.content_path.relative_to(
+            self.site.config.content_dir
+        ).as_posix()
+        return [self.layout_name, content_name]
+
+    def convert(self, text):
+        with self.site.span("convert", self.content_path):
+            cache = self.site.markdown_cache
+            if cache is None:
+                return self.backend.convert(text)
+            key = cache.make_key(text, self.backend.get_options())
+            result = cache.get(key)
+            if result is None:
+                result = self.backend.convert(text)
+                cache.set(key, result)
+            return result
+
+    def uses_jinja(self, source):
+        # Most Markdown is plain prose: send it straight to the converter rather
+        # than compile a template for it. Sources can also opt out of the Jinja
+        # pass, per page type or with `jinja: false` in their front matter.
+        env = self.site.env
+        markers = (
+            env.block_start_string,
+            env.variable_start_string,
+            env.comment_start_string,
+        )
+        if not self.jinja or not any(marker in source for marker in markers):
+            return False
+        meta = self.backend.parse_front_matter(source.splitlines())
+        return not (isinstance(meta, dict) and meta.get("jinja") is False)
+
+    def get_content_source(self):
+        template_name = self.content_path.relative_to(
+            self.site.config.content_dir
+        ).as_posix()
+        source, _, _ = self.site.env.loader.get_source(self.site.env, template_name)
+        return template_name, source
+
+    def add_content(self, context, text):
+        context["content"], meta = self.convert(text)
+        if meta:
+            context.update(meta)
+        return context
+
     def get_context(self):
         context = super().get_context()
-        text = self.site.render_template(
-            self.content_path.relative_to(self.site.config.content_dir).as_posix(),
-            **context,
-        )
-        context["content"] = self.markdown.convert(text)
-        if self.markdown.Meta:
-            context.update(self.markdown.Meta)
-        self.markdown.reset()
+        template_name, source = self.get_content_source()
+        if self.uses_jinja(source):
+            with self.site.span("render", self.content_path):
+                text = self.site.render_template(template_name, **context)
+        else:
+            text = source
+        return self.add_content(context, text)
+
+    async def get_context_async(self):
+        context = super().get_context()
+        template_name, source = self.get_content_source()
+        if self.uses_jinja(source):
+            with self.site.span("render", self.content_path):
+                text = await self.site.render_template_async(template_name, **context)
+        else:
+            text = source
+        return self.add_content(context, text)
+
+    def get_listing_context(self):
+        if not self.front_matter_listing:
+            return super().get_listing_context()
+        # Fill the listing from the YAML front matter alone, and only render and
+        # convert the body if a template actually reads `content`.
+        context = LazyContext(self.get_default_context())
+        meta = self.backend.read_front_matter(self.content_path)
+        if meta:
+            context.update(meta)
+        context.loaders["content"] = lambda: self.get_context()["content"]
+        if self.content_path.stem == "index":
+            context.loaders["pages"] = self._get_sibling_context_list
         return context
+
+    def get_listing_paths(self):
+        # Front matter can set either, as the evaluated context does, such as
+        # a post that links to another site.
+        paths = super().get_listing_paths()
+        meta = self.backend.read_front_matter(self.content_path) or {}
+        return paths | {key: meta[key] for key in paths if key in meta}
+
+    def get_metadata(self):
+        meta = self.backend.read_front_matter(self.content_path)
+        return super().get_metadata() | (meta or {})
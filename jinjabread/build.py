@@ -1,8 +1,40 @@
 from .base import Site
 from .config import Config
+from .deploy import write_deploy_manifest
+from .profiling import Profiler, Tracer
+from .utils import parse_shard
 
 
-def build(**kwargs):
+def build(
+    *,
+    profile=None,
+    profile_top=10,
+    trace=None,
+    shard=None,
+    deploy_manifest=None,
+    **kwargs,
+):
     config = Config.load(**kwargs)
-    site = Site(config)
-    site.generate()
+    profiler = Profiler() if profile else None
+    tracer = Tracer(trace) if trace else None
+    site = Site(
+        config,
+        instruments=[i for i in (profiler, tracer) if i],
+        shard=parse_shard(shard) if shard else None,
+    )
+    try:
+        site.generate()
+    finally:
+        site.close()
+    if deploy_manifest:
+        write_deploy_manifest(
+            deploy_manifest,
+            config.output_dir,
+            site.get_output_names(),
+            url_paths=site.url_paths,
+        )
+    if tracer:
+        tracer.close()
+    if profiler:
+        profiler.save(profile)
+        print(profiler.format_slowest(profile_top))
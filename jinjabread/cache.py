@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+
+
+class MarkdownCache:
+    """A size-capped, least-recently-used store of converted Markdown.
+
+    Entries are keyed by the Markdown text (after its Jinja pass) together with
+    the converter's configuration, so editing either one misses the cache
+    instead of serving stale HTML. Once the stored values outgrow `max_size`
+    bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, *, max_size):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        # With async_render, Markdown may be converted on the site's render
+        # thread while the build's thread waits for it, never at the same time.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # A cache can always be rebuilt, so trade durability for speed: skip the
+        # fsync on every commit.
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS markdown (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    used INTEGER NOT NULL
+                )
+                """)
+        self.size, self.clock = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) FROM markdown"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(text, options):
+        digest = hashlib.sha256()
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        digest.update(b"\0")
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def tick(self):
+        # A logical clock orders entries by use without relying on the
+        # resolution of the system clock.
+        self.clock += 1
+        return self.clock
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT value FROM markdown WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            self.connection.execute(
+                "UPDATE markdown SET used = ? WHERE key = ?", (self.tick(), key)
+            )
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        blob = pickle.dumps(value)
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT size FROM markdown WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO markdown VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), self.tick()),
+            )
+            self.size += len(blob) - (row[0] if row else 0)
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        # Keep the most recently used entries that fit within `max_size`.
+        self.connection.execute(
+            """
+            DELETE FROM markdown WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY used DESC, key) AS total
+                    FROM markdown
+                )
+                WHERE total > ?
+            )
+            """,
+            (self.max_size,),
+        )
+        (self.size,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM markdown"
+        ).fetchone()
+
+    def close(self):
+        self.connection.close()
+
+
+class PageCache:
+    """A directory of rendered pages, addressed by a hash of their inputs.
+
+    Each entry is a plain file named by its key, written once by renaming it
+    into place and never modified, so any number of builds can read and write
+    the directory at once. That makes it safe to share between machines, over
+    NFS or as a saved and restored CI cache. Nothing is ever evicted; delete the
+    directory, or old entries in it, at any time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path(self, key):
+        return self.path / key[:2] / key
+
+    def load(self, key, destination):
+        try:
+            shutil.copyfile(self.get_path(key), destination)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self, key, source):
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Readers on other machines see either no entry or a complete one.
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file, source.open("rb") as source_file:
+            shutil.copyfileobj(source_file, file)
+        os.replace(temp_path, path)
+
+    def load_text(self, key):
+        # Text entries, such as rendered template fragments, are kept the same
+        # way as pages.
+        try:
+            return self.get_path(key).read_bytes().decode()
+        except FileNotFoundError:
+            return None
+
+    def save_text(self, key, text):
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file:
+            file.write(text.encode())
+        os.replace(temp_path, path)
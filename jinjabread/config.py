@@ -1,9 +1,7 @@
 import dataclasses
-from pathlib import Path
+from pathlib import Path, PurePath
 import tomllib
 import typing
-from .base import PageFactory
-from .utils import load_page_class
 
 CONFIG_FILENAME = "jinjabread.toml"
 
@@ -14,16 +12,40 @@ class Config:
     content_dir: Path
     layouts_dir: Path
     static_dir: Path
+    data_dir: Path
     output_dir: Path
+    cache_dir: Path
     prettify_html: bool
+    markdown_cache: bool
+    markdown_cache_max_size: int
+    page_cache: bool
+    page_cache_dir: Path
+    staged_output: bool
+    fingerprint_static: bool
+    base_url: str
+    sitemap: bool
+    sitemap_max_urls: int
+    async_render: bool
+    async_concurrency: int
     context: dict
-    page_factories: typing.List[PageFactory]
+    page_factories: typing.List["PageFactory"]
+    taxonomies: typing.List["Taxonomy"]
+    feeds: typing.List["Feed"]
 
     @classmethod
     def load(cls, *, project_dir=None, config_file=None):
+        # Imported here, so that reading CONFIG_FILENAME (as `new` does) doesn't
+        # load the page types and what they depend on.
+        from .base import PageFactory
+        from .feeds import Feed
+        from .taxonomy import Taxonomy
+        from .utils import load_page_class
+
         suppress_missing_config_file_error = config_file is None
 
-        project_dir = Path(project_dir or ".")
+        # Any path object is kept as it is, such as a VirtualPath.
+        if not isinstance(project_dir, PurePath):
+            project_dir = Path(project_dir or ".")
         config_file = project_dir / Path(config_file or CONFIG_FILENAME)
 
         with (Path(__file__).parent / "defaults.toml").open("rb") as file:
@@ -47,10 +69,25 @@ class Config:
             content_dir=project_dir / data["content_dir"],
             layouts_dir=project_dir / data["layouts_dir"],
             static_dir=project_dir / data["static_dir"],
+            data_dir=project_dir / data["data_dir"],
             output_dir=project_dir / data["output_dir"],
+            cache_dir=project_dir / data["cache_dir"],
             prettify_html=data["prettify_html"],
+            markdown_cache=data["markdown_cache"],
+            markdown_cache_max_size=data["markdown_cache_max_size"],
+            page_cache=data["page_cache"],
+            page_cache_dir=project_dir / data["page_cache_dir"],
+            staged_output=data["staged_output"],
+            fingerprint_static=data["fingerprint_static"],
+            base_url=data["base_url"],
+            sitemap=data["sitemap"],
+            sitemap_max_urls=data["sitemap_max_urls"],
+            async_render=data["async_render"],
+            async_concurrency=data["async_concurrency"],
             context=data["context"],
             page_factories=page_factories,
+            taxonomies=[Taxonomy(**kwargs) for kwargs in data.get("taxonomies", [])],
+            feeds=[Feed(**kwargs) for kwargs in data.get("feeds", [])],
         )
 
     def as_dict(self):
@@ -0,0 +1,204 @@
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import time
+import traceback
+from pathlib import Path
+
+from .errors import DaemonError
+
+# Where a project's daemon listens, relative to the project directory.
+DAEMON_SOCKET = ".jinjabread-daemon.sock"
+
+# The options of `build` that the daemon builds with.
+DAEMON_BUILD_OPTIONS = ("shard", "deploy_manifest")
+
+
+def get_socket_path(project_dir, socket_path=None):
+    return Path(socket_path or Path(project_dir or ".") / DAEMON_SOCKET)
+
+
+def request_build(
+    *,
+    project_dir=None,
+    config_file=None,
+    socket_path=None,
+    on_event=None,
+    **options,
+):
+    """Ask the daemon listening at `socket_path` to build a project.
+
+    Takes the same options as `build` (except profiling and tracing) and
+    imports none of the build's dependencies, so it starts fast. Calls
+    `on_event` with each event the daemon streams back while it builds, such
+    as `{"event": "page", "path": "posts/post1.md"}`. Prints a summary and
+    returns the final `done` event; raises DaemonError if the daemon isn't
+    running or the build fails.
+    """
+    unsupported = [name for name in options if name not in DAEMON_BUILD_OPTIONS]
+    if unsupported:
+        raise DaemonError(
+            f"The daemon can't build with: {', '.join(unsupported)}. "
+            "Profile and trace a build without the daemon."
+        )
+    socket_path = get_socket_path(project_dir, socket_path)
+    request = {
+        "project_dir": str(Path(project_dir or ".").resolve()),
+        "config_file": config_file,
+        # Paths are sent absolute, since the daemon runs elsewhere.
+        "options": {
+            name: str(Path(value).resolve()) if name == "deploy_manifest" else value
+            for name, value in options.items()
+        },
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(os.fspath(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise DaemonError(
+                f"No daemon is listening on {socket_path}. Start one with: "
+                f"python -m jinjabread daemon {project_dir or '.'}"
+            ) from None
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("r") as responses:
+            for line in responses:
+                event = json.loads(line)
+                if event["event"] == "error":
+                    raise DaemonError(f"Build failed:\n{event['traceback']}")
+                if event["event"] == "done":
+                    print(f"Built {event['files']} files in {event['seconds']:.2f}s")
+                    return event
+                if on_event is not None:
+                    on_event(event)
+    raise DaemonError("The daemon closed the connection before the build finished.")
+
+
+def print_event(event):
+    """Print each page the daemon builds, as `build --daemon` does."""
+    if event["event"] == "page":
+        print(event["path"], flush=True)
+
+
+class _Reporter:
+    # An instrument that streams each generated page back to the client.
+
+    def __init__(self, send):
+        self.send = send
+
+    @contextlib.contextmanager
+    def span(self, name, path=None):
+        yield
+        if name == "generate" and path is not None:
+            self.send({"event": "page", "path": path})
+
+
+class _BuildHandler(socketserver.StreamRequestHandler):
+
+    def send(self, event):
+        self.wfile.write(json.dumps(event).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        start = time.perf_counter()
+        try:
+            site = self.server.get_site(request["project_dir"], request["config_file"])
+            outputs = self.server.build(site, self.send, **request["options"])
+        except Exception:
+            self.send({"event": "error", "traceback": traceback.format_exc()})
+            return
+        self.send(
+            {
+                "event": "done",
+                "files": len(outputs),
+                "seconds": time.perf_counter() - start,
+            }
+        )
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Builds projects on request over a Unix socket, keeping each one's Site
+    warm between builds.
+
+    A warm Site keeps its compiled templates (recompiled when their files
+    change), its Markdown converter, and its caches, and skips interpreter
+    startup, imports, and loading the config. A project's Site is closed and
+    replaced when its config file changes. Builds run one at a time.
+    """
+
+    def __init__(self, socket_path):
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            # Replace a socket left behind by a daemon that didn't shut down,
+            # but not one that is still listening.
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(os.fspath(socket_path))
+                except ConnectionRefusedError:
+                    socket_path.unlink()
+                else:
+                    raise DaemonError(f"A daemon is already listening on {socket_path}")
+        self.socket_path = socket_path
+        # Each project's Site, and the config file's mtime it was loaded at.
+        self.sites = {}
+        super().__init__(os.fspath(socket_path), _BuildHandler)
+
+    def get_site(self, project_dir, config_file):
+        from .base import Site
+        from .config import CONFIG_FILENAME, Config
+
+        config_path = Path(project_dir) / (config_file or CONFIG_FILENAME)
+        try:
+            mtime = config_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        key = (project_dir, config_file)
+        if key not in self.sites or self.sites[key][1] != mtime:
+            config = Config.load(project_dir=project_dir, config_file=config_file)
+            if key in self.sites:
+                self.sites.pop(key)[0].close()
+            self.sites[key] = Site(config), mtime
+        return self.sites[key][0]
+
+    def build(self, site, send, *, shard=None, deploy_manifest=None):
+        from .deploy import write_deploy_manifest
+        from .utils import parse_shard
+
+        site.shard = parse_shard(shard) if shard else None
+        site.instruments = [_Reporter(send)]
+        try:
+            site.generate()
+        finally:
+            site.instruments = []
+        if deploy_manifest:
+            write_deploy_manifest(
+                deploy_manifest,
+                site.config.output_dir,
+                site.get_output_names(),
+                url_paths=site.url_paths,
+            )
+        return site.outputs
+
+    def server_close(self):
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+        for site, _ in self.sites.values():
+            site.close()
+        self.sites = {}
+
+
+def daemon(*, project_dir=None, config_file=None, socket_path=None):
+    socket_path = get_socket_path(project_dir, socket_path)
+    with DaemonServer(socket_path) as server:
+        # Load the project now, so the first build is warm too.
+        server.get_site(str(Path(project_dir or ".").resolve()), config_file)
+        print(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,92 @@
+import collections.abc
+import csv
+import io
+import json
+import tomllib
+
+from . import errors
+
+
+def load_json(path):
+    return json.loads(path.read_bytes())
+
+
+def load_toml(path):
+    return tomllib.loads(path.read_text(encoding="utf-8"))
+
+
+def load_csv(path):
+    # A list of rows, each a dict keyed by the header row.
+    text = path.read_text(encoding="utf-8")
+    return list(csv.DictReader(io.StringIO(text, newline="")))
+
+
+# How to parse a data file, by its suffix.
+DATA_LOADERS = {
+    ".json": load_json,
+    ".toml": load_toml,
+    ".csv": load_csv,
+}
+
+
+class DataDirectory(collections.abc.Mapping):
+    """The files of a site's data directory, parsed the first time they're read.
+
+    Maps each JSON, TOML, or CSV file's name, without its suffix, to its parsed
+    contents, and each subdirectory's name to a DataDirectory of its own, so
+    `data.authors` reads `data/authors.json` and `data.shop.products` reads
+    `data/shop/products.csv`. A file is parsed once, then kept, so every page
+    that reads it during a build shares the one copy, and files no page reads
+    are never parsed.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._paths = None
+        self._values = {}
+
+    def _list(self):
+        if self._paths is None:
+            self._paths = {}
+            paths = sorted(self._path.iterdir()) if self._path.is_dir() else []
+            for path in paths:
+                # Ignore hidden files and directories.
+                if path.name.startswith("."):
+                    continue
+                if path.is_dir():
+                    name = path.name
+                elif path.suffix in DATA_LOADERS:
+                    name = path.stem
+                else:
+                    continue
+                if name in self._paths:
+                    raise errors.DataError(
+                        f"Data files {self._paths[name].as_posix()} and "
+                        f"{path.as_posix()} have the same name: {name}"
+                    )
+                self._paths[name] = path
+        return self._paths
+
+    def _load(self, path):
+        if path.is_dir():
+            return DataDirectory(path)
+        try:
+            return DATA_LOADERS[path.suffix](path)
+        except (ValueError, csv.Error) as error:
+            raise errors.DataError(
+                f"Invalid data file {path.as_posix()}: {error}"
+            ) from error
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self._values[name] = self._load(self._list()[name])
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._list())
+
+    def __len__(self):
+        return len(self._list())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._path.as_posix()!r})"
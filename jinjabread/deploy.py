@@ -0,0 +1,77 @@
+import json
+import os
+from pathlib import Path
+
+from .utils import get_temp_path, hash_file
+
+
+def make_deploy_manifest(output_dir, names, *, url_paths, previous=None):
+    """Describe the files `names` in `output_dir` and how they differ from the
+    `previous` manifest.
+
+    `url_paths` maps a file's name to the URL path it is served at, for files
+    not served at their own name (pages). The manifest lists every file, with
+    its hash and URL path, then the files `added`, `changed`, and `removed`
+    since `previous`. A file whose size and mtime match `previous` keeps its
+    recorded hash rather than being read again.
+    """
+    previous_files = previous["files"] if previous else {}
+    files = {}
+    for name in sorted(set(names)):
+        stat = (output_dir / name).stat()
+        entry = previous_files.get(name)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            entry = {"sha256": hash_file(output_dir / name)}
+        files[name] = {
+            "sha256": entry["sha256"],
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "url_path": url_paths.get(name, "/" + name),
+        }
+
+    def describe(name, entry):
+        return {"path": name, "url_path": entry["url_path"], "sha256": entry["sha256"]}
+
+    return {
+        "added": [
+            describe(name, entry)
+            for name, entry in files.items()
+            if name not in previous_files
+        ],
+        "changed": [
+            describe(name, entry)
+            for name, entry in files.items()
+            if name in previous_files
+            and entry["sha256"] != previous_files[name]["sha256"]
+        ],
+        "removed": [
+            describe(name, entry)
+            for name, entry in previous_files.items()
+            if name not in files
+        ],
+        "files": files,
+    }
+
+
+def write_deploy_manifest(path, output_dir, names, *, url_paths):
+    """Write the deploy manifest of a build to `path`, diffed against the one
+    already there."""
+    path = Path(path)
+    try:
+        with path.open() as file:
+            previous = json.load(file)
+    except FileNotFoundError:
+        previous = None
+    manifest = make_deploy_manifest(
+        output_dir, names, url_paths=url_paths, previous=previous
+    )
+    temp_path = get_temp_path(path)
+    with temp_path.open("w") as file:
+        json.dump(manifest, file, indent=2)
+        file.write("\n")
+    os.replace(temp_path, path)
+    return manifest
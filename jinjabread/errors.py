@@ -4,3 +4,31 @@ class Error(Exception):
 
 class PageNotMatchedError(Error):
     pass
+
+
+class ShardError(Error):
+    pass
+
+
+class PaginationError(Error):
+    pass
+
+
+class TaxonomyError(Error):
+    pass
+
+
+class FeedError(Error):
+    pass
+
+
+class AssetNotFoundError(Error):
+    pass
+
+
+class DataError(Error):
+    pass
+
+
+class DaemonError(Error):
+    pass
@@ -0,0 +1,138 @@
+import hashlib
+import json
+
+from jinja2 import meta, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """The fragments `{% cache %}` rendered during a build.
+
+    A fragment is keyed by the template and line of its `{% cache %}` tag and
+    by the tag's key, and rendered once per build. With the site's page cache,
+    fragments are also kept across builds, keyed as well by the site's config
+    and a digest of the template, of every template it references, and of the
+    data, taxonomies, and assets it reads. A template that reads `pages` keys
+    its fragments by every content file too.
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self.fragments = {}
+        self.persistent_keys = {}
+        self.pages_readers = {}
+
+    def reads_pages(self, template_name):
+        # Whether a template, or one it references, reads `pages`, which lists
+        # content files. Only called once digest_template has found every
+        # reference, so they all parse and are named statically.
+        if template_name not in self.pages_readers:
+            # Stays False for a template that references itself.
+            self.pages_readers[template_name] = False
+            env = self.site.env
+            source, _, _ = env.loader.get_source(env, template_name)
+            ast = env.parse(source)
+            names = {node.name for node in ast.find_all(nodes.Name)}
+            self.pages_readers[template_name] = "pages" in names or any(
+                self.reads_pages(reference)
+                for reference in meta.find_referenced_templates(ast)
+            )
+        return self.pages_readers[template_name]
+
+    def get_persistent_key(self, name):
+        # A hash of everything a fragment depends on besides its key, or None
+        # if that can't be known statically.
+        if name not in self.persistent_keys:
+            self.persistent_keys[name] = self._make_persistent_key(name)
+        return self.persistent_keys[name]
+
+    def _make_persistent_key(self, name):
+        template_name, lineno, key = name
+        if self.site.page_cache is None or template_name is None:
+            return None
+        template_digest = self.site.digest_template(template_name)
+        if template_digest is None:
+            return None
+        digest = hashlib.sha256(self.site.config_digest.encode())
+        digest.update(b"fragment\0" + template_digest)
+        if self.reads_pages(template_name):
+            tree_digest = self.site.digest_tree(self.site.config.content_dir)
+            if tree_digest is None:
+                return None
+            digest.update(tree_digest)
+        digest.update(f"{lineno}\0{key}".encode())
+        return digest.hexdigest()
+
+    def get(self, name):
+        if name not in self.fragments:
+            persistent_key = self.get_persistent_key(name)
+            if persistent_key is not None:
+                text = self.site.page_cache.load_text(persistent_key)
+                if text is not None:
+                    self.fragments[name] = text
+        return self.fragments.get(name)
+
+    def set(self, name, text):
+        self.fragments[name] = text
+        persistent_key = self.get_persistent_key(name)
+        if persistent_key is not None:
+            self.site.page_cache.save_text(persistent_key, text)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds `{% cache key %}...{% endcache %}`, which renders its body once for
+    each key and reuses the output wherever the same tag has the same key.
+
+    The key is any expression, such as a string or a list. It must capture
+    everything the body reads that can differ between the pages that render it,
+    such as the current page's URL in a menu that highlights it. A Site sets the
+    environment's `fragment_cache` to a FragmentCache; without one, the body is
+    rendered every time.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        args = [nodes.Const(parser.name), nodes.Const(lineno), key]
+        return nodes.CallBlock(
+            self.call_method("_render", args), [], [], body
+        ).set_lineno(lineno)
+
+    def _get_name(self, template_name, lineno, key):
+        return (
+            template_name,
+            lineno,
+            json.dumps(key, sort_keys=True, default=str),
+        )
+
+    def _render(self, template_name, lineno, key, caller):
+        cache = self.environment.fragment_cache
+        if self.environment.is_async:
+            return self._render_async(cache, template_name, lineno, key, caller)
+        if cache is None:
+            return caller()
+        name = self._get_name(template_name, lineno, key)
+        text = cache.get(name)
+        if text is None:
+            text = caller()
+            cache.set(name, text)
+        # The body's output, escaped as it was rendered.
+        return Markup(text)
+
+    async def _render_async(self, cache, template_name, lineno, key, caller):
+        if cache is None:
+            return await caller()
+        name = self._get_name(template_name, lineno, key)
+        text = cache.get(name)
+        if text is None:
+            text = await caller()
+            cache.set(name, text)
+        return Markup(text)
@@ -0,0 +1,323 @@
+import datetime
+import email.utils
+import heapq
+import os
+import urllib.parse
+from xml.sax.saxutils import escape, quoteattr
+
+from . import errors
+from .utils import get_temp_path
+
+SITEMAP_MAX_URLS = 50000
+
+# An empty feed's <updated>, so that it is the same from build to build.
+EMPTY_FEED_UPDATED = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+_SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def absolute_url(base_url, url_path):
+    """Join a site's `base_url` and a page's `url_path` into an absolute URL."""
+    return base_url.rstrip("/") + urllib.parse.quote(url_path, safe="/")
+
+
+def as_datetime(value):
+    """Read a front matter date (a date, a datetime or an ISO 8601 string) as an
+    aware datetime, in UTC if it has no time zone."""
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+class SitemapWriter:
+    """Streams URLs into `sitemap.xml` as pages are generated.
+
+    URLs are written to numbered sitemap files of up to `max_urls` URLs each,
+    so memory use doesn't grow with the site. On `close`, a single file becomes
+    `sitemap.xml`; several are listed by a `sitemap.xml` sitemap index. A shard
+    of a build leaves its files for `merge` to list instead. Files are written
+    under temporary names and moved into place by `install` on `close`, or
+    removed by `abort`.
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        *,
+        base_url,
+        max_urls=SITEMAP_MAX_URLS,
+        prefix="sitemap",
+        install=os.replace,
+    ):
+        self.output_dir = output_dir
+        self.base_url = base_url
+        self.max_urls = max_urls
+        self.prefix = prefix
+        self.install = install
+        self.temp_paths = []
+        self.paths = []
+        self.file = None
+        self.count = 0
+
+    def open_file(self):
+        self.close_file()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        number = len(self.temp_paths) + 1
+        temp_path = get_temp_path(self.output_dir / f"{self.prefix}-{number}.xml")
+        self.temp_paths.append(temp_path)
+        self.file = temp_path.open("w")
+        self.file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<urlset xmlns="{_SITEMAP_NAMESPACE}">\n'
+        )
+        self.count = 0
+
+    def add(self, url_path):
+        if self.file is None or self.count == self.max_urls:
+            self.open_file()
+        loc = escape(absolute_url(self.base_url, url_path))
+        self.file.write(f"  <url><loc>{loc}</loc></url>\n")
+        self.count += 1
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.write("</urlset>\n")
+            self.file.close()
+            self.file = None
+
+    def abort(self):
+        """Discard the sitemap files written so far, after a failed build."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for temp_path in self.temp_paths:
+            temp_path.unlink(missing_ok=True)
+        self.temp_paths = []
+
+    def close(self, *, index=True):
+        """Finish the sitemap and return the paths of the files written.
+
+        With `index` false, only the numbered sitemap files are written.
+        """
+        if not self.temp_paths:
+            # An empty site still gets a valid, empty sitemap.
+            self.open_file()
+        self.close_file()
+        sitemap_path = self.output_dir / "sitemap.xml"
+        if index and len(self.temp_paths) == 1:
+            self.install(self.temp_paths[0], sitemap_path)
+            return [sitemap_path]
+        self.paths = [
+            self.output_dir / f"{self.prefix}-{number}.xml"
+            for number in range(1, len(self.temp_paths) + 1)
+        ]
+        for temp_path, path in zip(self.temp_paths, self.paths):
+            self.install(temp_path, path)
+        if not index:
+            return self.paths
+        write_sitemap_index(
+            sitemap_path, self.paths, base_url=self.base_url, install=self.install
+        )
+        return [sitemap_path, *self.paths]
+
+
+def write_sitemap_index(path, sitemap_paths, *, base_url, install=os.replace):
+    temp_path = get_temp_path(path)
+    with temp_path.open("w") as file:
+        file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<sitemapindex xmlns="{_SITEMAP_NAMESPACE}">\n'
+        )
+        for sitemap_path in sitemap_paths:
+            relative_path = sitemap_path.relative_to(path.parent).as_posix()
+            loc = escape(absolute_url(base_url, "/" + relative_path))
+            file.write(f"  <sitemap><loc>{loc}</loc></sitemap>\n")
+        file.write("</sitemapindex>\n")
+    install(temp_path, path)
+
+
+class Feed:
+    """An Atom or RSS feed of a site's most recent pages.
+
+    Declared with a `[[feeds]]` entry in jinjabread.toml. Pages whose content
+    path matches `glob_pattern` and whose front matter has a `date_key` are
+    entries, and the `limit` most recent are written to `path`, in the output
+    directory. An Atom feed's author is `author`, or its title; an entry's is
+    the page's `author`, if it sets one.
+    """
+
+    FORMATS = ("atom", "rss")
+
+    def __init__(
+        self,
+        *,
+        path="feed.xml",
+        title=None,
+        author=None,
+        format="atom",
+        glob_pattern="**/*",
+        date_key="date",
+        limit=20,
+    ):
+        if format not in self.FORMATS:
+            raise errors.FeedError(f"Invalid feed format: {format}")
+        self.path = path
+        self.title = title
+        self.author = author
+        self.format = format
+        self.glob_pattern = glob_pattern
+        self.date_key = date_key
+        self.limit = limit
+
+    def make_entry(self, page):
+        # Index pages split by pagination, and generated pages such as term
+        # pages, are never entries.
+        if page.content_path is None or page.pagination is not None:
+            return None
+        if not page.content_path.match(self.glob_pattern):
+            return None
+        # Read from what the page sets without rendering, so no page is
+        # rendered a second time, and cached pages aren't rendered at all.
+        context = page.get_metadata()
+        date = context.get(self.date_key)
+        if date is None:
+            return None
+        try:
+            updated = as_datetime(date)
+        except (TypeError, ValueError):
+            raise errors.FeedError(
+                f"Invalid {self.date_key} for {self.path}: {date!r} "
+                f"({page.content_path.as_posix()})"
+            ) from None
+        url_path = page.get_listing_paths()["url_path"]
+        return {
+            "title": str(context.get("title") or url_path),
+            "url_path": url_path,
+            "updated": updated,
+            "summary": context.get("summary"),
+            "author": context.get("author"),
+        }
+
+
+class FeedWriter:
+    """Keeps a feed's most recent entries as pages are generated, then writes
+    the feed."""
+
+    def __init__(self, feed):
+        self.feed = feed
+        # A min-heap, so the oldest kept entry is the one to drop.
+        self.heap = []
+
+    def add(self, entry):
+        item = (entry["updated"], entry["url_path"], entry)
+        if len(self.heap) < self.feed.limit:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+
+    def add_page(self, page):
+        entry = self.feed.make_entry(page)
+        if entry is not None:
+            self.add(entry)
+
+    def dump_entries(self):
+        # The entries as JSON, for a shard's manifest.
+        return [
+            entry | {"updated": entry["updated"].isoformat()}
+            for entry in self.get_entries()
+        ]
+
+    def load_entries(self, entries):
+        for entry in entries:
+            self.add(entry | {"updated": as_datetime(entry["updated"])})
+
+    def get_entries(self):
+        """The entries, most recent first."""
+        return [
+            entry
+            for *_, entry in sorted(self.heap, key=lambda item: item[:2], reverse=True)
+        ]
+
+    def write(self, output_dir, *, base_url, install=os.replace):
+        """Write the feed and return its path.
+
+        The feed is written under a temporary name and moved into place by
+        `install`.
+        """
+        path = output_dir / self.feed.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        title = self.feed.title or base_url
+        entries = self.get_entries()
+        temp_path = get_temp_path(path)
+        with temp_path.open("w") as file:
+            if self.feed.format == "atom":
+                self_url = absolute_url(base_url, "/" + self.feed.path.lstrip("/"))
+                author = self.feed.author or title
+                write_atom(file, title, author, self_url, entries, base_url)
+            else:
+                write_rss(file, title, entries, base_url)
+        install(temp_path, path)
+        return path
+
+
+def write_atom(file, title, author, self_url, entries, base_url):
+    home_url = absolute_url(base_url, "/")
+    updated = entries[0]["updated"] if entries else EMPTY_FEED_UPDATED
+    file.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        f"  <title>{escape(title)}</title>\n"
+        f"  <id>{escape(home_url)}</id>\n"
+        f"  <link href={quoteattr(home_url)}/>\n"
+        f'  <link rel="self" href={quoteattr(self_url)}/>\n'
+        f"  <updated>{updated.isoformat()}</updated>\n"
+        f"  <author><name>{escape(str(author))}</name></author>\n"
+    )
+    for entry in entries:
+        url = absolute_url(base_url, entry["url_path"])
+        file.write(
+            "  <entry>\n"
+            f"    <title>{escape(entry['title'])}</title>\n"
+            f"    <id>{escape(url)}</id>\n"
+            f"    <link href={quoteattr(url)}/>\n"
+            f"    <updated>{entry['updated'].isoformat()}</updated>\n"
+        )
+        if entry.get("author"):
+            file.write(
+                f"    <author><name>{escape(str(entry['author']))}</name></author>\n"
+            )
+        if entry["summary"]:
+            file.write(f"    <summary>{escape(str(entry['summary']))}</summary>\n")
+        file.write("  </entry>\n")
+    file.write("</feed>\n")
+
+
+def write_rss(file, title, entries, base_url):
+    home_url = absolute_url(base_url, "/")
+    file.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0">\n'
+        "  <channel>\n"
+        f"    <title>{escape(title)}</title>\n"
+        f"    <link>{escape(home_url)}</link>\n"
+        f"    <description>{escape(title)}</description>\n"
+    )
+    for entry in entries:
+        url = escape(absolute_url(base_url, entry["url_path"]))
+        file.write(
+            "    <item>\n"
+            f"      <title>{escape(entry['title'])}</title>\n"
+            f"      <link>{url}</link>\n"
+            f'      <guid isPermaLink="true">{url}</guid>\n'
+            f"      <pubDate>{email.utils.format_datetime(entry['updated'])}</pubDate>\n"
+        )
+        if entry["summary"]:
+            file.write(
+                f"      <description>{escape(str(entry['summary']))}</description>\n"
+            )
+        file.write("    </item>\n")
+    file.write("  </channel>\n</rss>\n")
@@ -0,0 +1,101 @@
+import importlib
+import markdown
+
+from .utils import parse_front_matter, read_front_matter, split_front_matter
+
+
+class MarkdownBackend:
+    """Turns the source of a Markdown page into HTML and metadata.
+
+    A backend owns both halves of a Markdown page: its YAML front matter and its
+    body. Subclasses implement `convert`; the front-matter helpers default to
+    the YAML block that every built-in backend understands.
+    """
+
+    def __init__(self, *, extensions=None):
+        self.extensions = list(extensions or [])
+
+    def get_options(self):
+        # Everything that can change the output, to key cached conversions by.
+        return {"backend": type(self).__qualname__, "extensions": self.extensions}
+
+    def convert(self, text):
+        """Return the HTML body and the front matter (or None) of `text`."""
+        raise NotImplementedError
+
+    def parse_front_matter(self, lines):
+        return parse_front_matter(lines)
+
+    def read_front_matter(self, path):
+        return read_front_matter(path)
+
+
+class PythonMarkdownBackend(MarkdownBackend):
+    """Python-Markdown with the full_yaml_metadata extension (the default).
+
+    `extensions` names more Python-Markdown extensions to enable.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.markdown = markdown.Markdown(
+            extensions=["full_yaml_metadata", *self.extensions]
+        )
+
+    def get_options(self):
+        return super().get_options() | {"version": markdown.__version__}
+
+    def convert(self, text):
+        # Blank text returns early without running full_yaml_metadata, which
+        # would leave the previous page's metadata behind.
+        self.markdown.Meta = None
+        content = self.markdown.convert(text)
+        meta = self.markdown.Meta
+        self.markdown.reset()
+        return content, meta
+
+
+class CommonMarkBackend(MarkdownBackend):
+    """CommonMark, converted by the faster markdown-it-py.
+
+    Needs the optional dependency: `pip install jinjabread[commonmark]`.
+    `extensions` names more markdown-it rules to enable, such as "table" or
+    "strikethrough".
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import markdown_it
+        except ImportError as error:
+            raise ImportError(
+                "The commonmark Markdown backend requires markdown-it-py: "
+                "pip install jinjabread[commonmark]"
+            ) from error
+        self.version = markdown_it.__version__
+        self.markdown = markdown_it.MarkdownIt("commonmark")
+        if self.extensions:
+            self.markdown.enable(self.extensions)
+
+    def get_options(self):
+        return super().get_options() | {"version": self.version}
+
+    def convert(self, text):
+        meta, body = split_front_matter(text)
+        return self.markdown.render(body), meta
+
+
+MARKDOWN_BACKENDS = {
+    "python-markdown": PythonMarkdownBackend,
+    "commonmark": CommonMarkBackend,
+}
+
+
+def load_markdown_backend(name):
+    """Return the backend class registered as `name`, or at dotted path `name`."""
+    if name in MARKDOWN_BACKENDS:
+        return MARKDOWN_BACKENDS[name]
+    module_name, _, class_name = name.rpartition(".")
+    if not module_name:
+        raise TypeError(f"Invalid Markdown backend: {name}")
+    return getattr(importlib.import_module(module_name), class_name)
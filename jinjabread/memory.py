@@ -0,0 +1,237 @@
+import dataclasses
+import fnmatch
+import io
+from pathlib import PurePosixPath
+
+from jinja2 import BaseLoader, ChoiceLoader, TemplateNotFound
+
+from .base import Site
+from .config import Config
+
+
+class _WriteBuffer:
+    # Collects what is written to a VirtualPath, and stores it on close.
+
+    def __init__(self, path, buffer):
+        self.path = path
+        self.buffer = buffer
+
+    def __getattr__(self, name):
+        return getattr(self.buffer, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not self.buffer.closed:
+            self.path._tree.write(str(self.path), self.buffer.getvalue())
+            self.buffer.close()
+
+
+class _Tree:
+    # The files of a VirtualPath tree, by absolute path, and the names in each
+    # directory.
+
+    def __init__(self):
+        self.files = {}
+        self.children = {"/": set()}
+
+    def add_directory(self, key):
+        path = PurePosixPath(key)
+        self.children.setdefault(key, set())
+        while path != path.parent:
+            self.children.setdefault(str(path.parent), set()).add(path.name)
+            path = path.parent
+
+    def write(self, key, value):
+        path = PurePosixPath(key)
+        self.add_directory(str(path.parent))
+        self.children[str(path.parent)].add(path.name)
+        self.files[key] = value
+
+
+class VirtualPath(PurePosixPath):
+    """A path into an in-memory tree of files, for building without a disk.
+
+    Implements the part of `pathlib.Path` a build uses (reading, writing,
+    listing, and globbing files) against a tree shared by every path made from
+    the same root; see `make_root`. Files hold text or bytes, as written.
+    """
+
+    _tree = None
+
+    @classmethod
+    def make_root(cls, files=None):
+        """Return the root of a new tree holding `files`, a mapping of paths
+        (relative to the root) to text or bytes."""
+        tree_class = type(cls.__name__, (cls,), {"_tree": _Tree()})
+        root = tree_class("/")
+        for name, value in (files or {}).items():
+            root._tree.write(str(root / name), value)
+        return root
+
+    def __fspath__(self):
+        # Never let a virtual path reach the real filesystem.
+        raise TypeError(f"{str(self)!r} is an in-memory path")
+
+    def _key(self):
+        return str(self)
+
+    def exists(self):
+        return self.is_file() or self.is_dir()
+
+    def is_file(self):
+        return self._key() in self._tree.files
+
+    def is_dir(self):
+        return self._key() in self._tree.children
+
+    def iterdir(self):
+        if not self.is_dir():
+            raise NotADirectoryError(self._key())
+        for name in sorted(self._tree.children[self._key()]):
+            yield self / name
+
+    def _walk(self):
+        for path in self.iterdir():
+            yield path
+            if path.is_dir():
+                yield from path._walk()
+
+    def glob(self, pattern):
+        # Only the patterns a build uses: `*.ext` among a directory's entries,
+        # and `**/*.ext` among all its descendants.
+        recursive = pattern.startswith("**/")
+        name_pattern = pattern.removeprefix("**/")
+        if "/" in name_pattern or "**" in name_pattern:
+            raise ValueError(f"Unsupported glob pattern: {pattern}")
+        if not self.is_dir():
+            return
+        for path in self._walk() if recursive else self.iterdir():
+            if fnmatch.fnmatchcase(path.name, name_pattern):
+                yield path
+
+    def mkdir(self, mode=0o777, parents=False, exist_ok=False):
+        if self.is_file() or (self.is_dir() and not exist_ok):
+            raise FileExistsError(self._key())
+        if not parents and not self.parent.is_dir():
+            raise FileNotFoundError(self._key())
+        self._tree.add_directory(self._key())
+
+    def open(self, mode="r", buffering=-1, encoding=None, errors=None, newline=None):
+        binary = "b" in mode
+        if "r" in mode:
+            try:
+                value = self._tree.files[self._key()]
+            except KeyError:
+                raise FileNotFoundError(self._key()) from None
+            if binary:
+                return io.BytesIO(value if isinstance(value, bytes) else value.encode())
+            return io.StringIO(value if isinstance(value, str) else value.decode())
+        if not self.parent.is_dir():
+            raise FileNotFoundError(self._key())
+        buffer = io.BytesIO() if binary else io.StringIO()
+        if "a" in mode and self.is_file():
+            buffer.write(self._tree.files[self._key()])
+        return _WriteBuffer(self, buffer)
+
+    def read_text(self, encoding=None, errors=None):
+        with self.open() as file:
+            return file.read()
+
+    def read_bytes(self):
+        with self.open("rb") as file:
+            return file.read()
+
+    def write_text(self, data, encoding=None, errors=None, newline=None):
+        with self.open("w") as file:
+            return file.write(data)
+
+    def write_bytes(self, data):
+        with self.open("wb") as file:
+            return file.write(data)
+
+    def unlink(self, missing_ok=False):
+        if self._tree.files.pop(self._key(), None) is None and not missing_ok:
+            raise FileNotFoundError(self._key())
+        self._tree.children[str(self.parent)].discard(self.name)
+
+    def replace(self, target):
+        target = self.parent / target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self._tree.write(str(target), self._tree.files[self._key()])
+        self.unlink()
+        return target
+
+
+class VirtualLoader(BaseLoader):
+    """Loads templates from directories of a VirtualPath tree, in order."""
+
+    def __init__(self, searchpath):
+        self.searchpath = list(searchpath)
+
+    def get_source(self, environment, template):
+        for directory in self.searchpath:
+            path = directory / template
+            if path.is_file():
+                return path.read_text(), str(path), lambda: True
+        raise TemplateNotFound(template)
+
+
+class MemorySite(Site):
+    """A site whose project directory is a VirtualPath tree.
+
+    Builds like any other site, but reads its content, layouts, and static
+    files from memory and writes its output there; see `build_in_memory`.
+    `loader`, if given, is a Jinja loader for layouts to try first, such as a
+    FileSystemLoader for a site's real layouts. The Markdown and page caches
+    and staged output, which live on disk, are turned off.
+    """
+
+    def __init__(self, config, *, loader=None, **kwargs):
+        self.loader = loader
+        config = dataclasses.replace(
+            config, markdown_cache=False, page_cache=False, staged_output=False
+        )
+        super().__init__(config, **kwargs)
+
+    def make_loader(self):
+        loader = VirtualLoader([self.config.layouts_dir, self.config.content_dir])
+        if self.loader is None:
+            return loader
+        return ChoiceLoader([self.loader, loader])
+
+    def install_output(self, temp_path, output_path):
+        temp_path.replace(output_path)
+
+    def copy_output(self, source, output_path):
+        output_path.write_bytes(source.read_bytes())
+        self.record_output(output_path)
+
+    def get_outputs(self):
+        # The build's output, by path relative to the output directory.
+        return {
+            path.relative_to(self.config.output_dir).as_posix(): (
+                self.config.output_dir._tree.files[str(path)]
+            )
+            for path in self.outputs
+        }
+
+
+def build_in_memory(files, *, loader=None, config_file=None):
+    """Build a site from memory and return its output, without touching disk.
+
+    `files` maps paths in the project directory, such as "content/index.md",
+    "layouts/markdown.html", or "jinjabread.toml", to their text (or bytes).
+    `loader` is an optional Jinja loader to load layouts from first. Returns a
+    mapping of each output file's path, relative to the output directory, to
+    its text (or, for files copied as they are, its bytes).
+    """
+    project_dir = VirtualPath.make_root(files)
+    config = Config.load(project_dir=project_dir, config_file=config_file)
+    site = MemorySite(config, loader=loader)
+    site.generate()
+    return site.get_outputs()
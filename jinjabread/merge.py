@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+import shutil
+from .base import SHARD_MANIFEST
+from .config import Config
+from .deploy import write_deploy_manifest
+from .errors import ShardError
+from .feeds import FeedWriter, write_sitemap_index
+
+
+def merge(*, shard_dirs, deploy_manifest=None, **kwargs):
+    config = Config.load(**kwargs)
+
+    manifests = []
+    for shard_dir in map(Path, shard_dirs):
+        try:
+            with (shard_dir / SHARD_MANIFEST).open() as file:
+                manifests.append((shard_dir, json.load(file)))
+        except FileNotFoundError:
+            raise ShardError(f"Shard manifest not found: {shard_dir}") from None
+
+    counts = {manifest["shards"] for _, manifest in manifests}
+    indexes = sorted(manifest["shard"] for _, manifest in manifests)
+    if len(counts) != 1 or indexes != list(range(1, counts.pop() + 1)):
+        raise ShardError(f"Expected each of shards 1 to N exactly once, got: {indexes}")
+
+    owners = {}
+    for shard_dir, manifest in manifests:
+        for name in manifest["files"]:
+            if name in owners:
+                raise ShardError(
+                    f"Output written by more than one shard: {name} "
+                    f"({owners[name]}, {shard_dir})"
+                )
+            owners[name] = shard_dir
+
+    for name, shard_dir in owners.items():
+        output_path = config.output_dir / name
+        if output_path.exists() and output_path.samefile(shard_dir / name):
+            continue
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(shard_dir / name, output_path)
+
+    # Shards leave their sitemaps unlisted and their feed entries in their
+    # manifests, to be combined here.
+    names = list(owners)
+    sitemaps = [
+        config.output_dir / name
+        for _, manifest in manifests
+        for name in manifest.get("sitemaps", [])
+    ]
+    if sitemaps:
+        write_sitemap_index(
+            config.output_dir / "sitemap.xml", sitemaps, base_url=config.base_url
+        )
+        names.append("sitemap.xml")
+    for feed in config.feeds:
+        feed_writer = FeedWriter(feed)
+        for _, manifest in manifests:
+            feed_writer.load_entries(manifest.get("feeds", {}).get(feed.path, []))
+        path = feed_writer.write(config.output_dir, base_url=config.base_url)
+        names.append(path.relative_to(config.output_dir).as_posix())
+
+    if deploy_manifest:
+        url_paths = {}
+        for _, manifest in manifests:
+            url_paths |= manifest.get("url_paths", {})
+        write_deploy_manifest(
+            deploy_manifest, config.output_dir, names, url_paths=url_paths
+        )
@@ -0,0 +1,160 @@
+import collections
+import contextlib
+import contextvars
+import json
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+
+
+@contextlib.contextmanager
+def instrument_span(instruments, name, path=None):
+    """Report a span of work named `name` to every instrument at once."""
+    if not instruments:
+        yield
+        return
+    with contextlib.ExitStack() as stack:
+        for instrument in instruments:
+            stack.enter_context(instrument.span(name, path))
+        yield
+
+
+class Profiler:
+    """Records how long each stage of a build takes, per page and in total.
+
+    Stages nest (rendering an index page evaluates the pages it lists), so each
+    span records its exclusive time: its own duration minus that of the spans
+    inside it. Stage times then add up to the whole build without counting
+    anything twice, and a slow listed page shows up against itself rather than
+    against the index page that lists it.
+    """
+
+    PAGE_STAGES = ("match", "render", "convert", "prettify", "write")
+
+    def __init__(self):
+        self.pages = collections.defaultdict(lambda: collections.defaultdict(float))
+        self.totals = collections.defaultdict(float)
+        # The open spans, per context, so that pages rendering concurrently
+        # with async_render each nest their spans under their own.
+        self.stack = contextvars.ContextVar("stack", default=())
+
+    @contextlib.contextmanager
+    def span(self, name, path=None):
+        # The time spent in nested spans, to subtract from this one.
+        nested = [0.0]
+        stack = self.stack.get()
+        token = self.stack.set((*stack, nested))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stack.reset(token)
+            if stack:
+                stack[-1][0] += elapsed
+            self.totals[name] += elapsed - nested[0]
+            if path is not None:
+                self.pages[path][name] += elapsed - nested[0]
+
+    def report(self):
+        pages = []
+        for path, stages in self.pages.items():
+            row = {"path": path} | dict.fromkeys(self.PAGE_STAGES, 0.0) | stages
+            row["seconds"] = sum(stages.values())
+            pages.append(row)
+        pages.sort(key=lambda row: row["seconds"], reverse=True)
+        return {
+            "seconds": sum(self.totals.values()),
+            "totals": dict(self.totals),
+            "pages": pages,
+        }
+
+    def save(self, path):
+        with Path(path).open("w") as file:
+            json.dump(self.report(), file, indent=2)
+            file.write("\n")
+
+    def format_slowest(self, count):
+        report = self.report()
+        rows = report["pages"][:count]
+        width = max([len("page"), *(len(row["path"]) for row in rows)])
+        columns = [*self.PAGE_STAGES, "seconds"]
+        lines = [
+            f"Slowest {len(rows)} of {len(report['pages'])} pages"
+            f" (build took {report['seconds']:.3f}s):",
+            f"{'page':<{width}} " + " ".join(f"{name:>8}" for name in columns),
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['path']:<{width}} "
+                + " ".join(f"{row[name]:8.4f}" for name in columns)
+            )
+        return "\n".join(lines)
+
+
+class Tracer:
+    """Writes a build's spans as Chrome trace events, for chrome://tracing or
+    https://ui.perfetto.dev.
+
+    Events are appended to `path` a line at a time in the trace-event JSON array
+    format, which trace viewers read without its closing bracket, so a trace is
+    usable even while the build or server is still running. A tracer sent to a
+    worker process reopens the file there and appends its own events with
+    single writes, so every process's spans land on the same timeline.
+    """
+
+    def __init__(self, path, *, append=False):
+        self.path = Path(path)
+        if not append or not self.path.exists():
+            self.path.write_text("[\n")
+        self.file = None
+        self.pid = None
+
+    def __getstate__(self):
+        return self.__dict__ | {"file": None, "pid": None}
+
+    def write(self, event):
+        pid = os.getpid()
+        if self.pid != pid:
+            # Line buffering turns every event into one appending write.
+            self.pid = pid
+            self.file = self.path.open("a", buffering=1)
+            self.write(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": multiprocessing.current_process().name},
+                }
+            )
+        self.file.write(json.dumps(event) + ",\n")
+
+    @contextlib.contextmanager
+    def span(self, name, path=None):
+        # perf_counter is a system-wide monotonic clock, so timestamps from
+        # different processes are comparable.
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                "name": name,
+                "cat": "jinjabread",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+            }
+            if path is not None:
+                event["args"] = {"path": path}
+            self.write(event)
+
+    def close(self):
+        if self.file is not None and self.pid == os.getpid():
+            self.file.close()
+        self.file = None
+        self.pid = None
@@ -1,17 +1,43 @@
 import itertools
+import json
 import mimetypes
 from pathlib import Path
-from werkzeug.serving import run_simple
+from werkzeug.serving import is_running_from_reloader, run_simple
 from werkzeug.wrappers import Request, Response
 from werkzeug.utils import redirect
-from .base import Site
+from .base import ASSET_MANIFEST, Site
 from .config import Config
+from .profiling import Tracer, instrument_span
 
 
 class App:
 
-    def __init__(self, config):
+    def __init__(self, config, *, instruments=()):
         self.config = config
+        self.instruments = list(instruments)
+        # The fingerprinted static files, and the asset manifest's mtime when
+        # they were read.
+        self.fingerprinted_paths = set()
+        self.asset_manifest_mtime = None
+
+    def is_fingerprinted(self, file_path):
+        # Fingerprinted files never change, so they can be cached for good.
+        static_dir = self.config.output_dir / self.config.static_dir.name
+        manifest_path = static_dir / ASSET_MANIFEST
+        try:
+            mtime = manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime != self.asset_manifest_mtime:
+            with manifest_path.open() as file:
+                assets = json.load(file)
+            self.fingerprinted_paths = {
+                static_dir / published_name
+                for name, published_name in assets.items()
+                if published_name != name
+            }
+            self.asset_manifest_mtime = mtime
+        return file_path in self.fingerprinted_paths
 
     def dispatch_request(self, request):
         url_path = Path(request.path)
@@ -34,27 +60,37 @@ class App:
         try:
             with file_path.open("rb") as file:
                 mimetype, _ = mimetypes.guess_type(file_path.name)
-                return Response(
+                response = Response(
                     file.read(),
                     status=200,
                     mimetype=mimetype,
                 )
         except FileNotFoundError:
             return Response(f"File Not Found: {file_path}", status=404)
+        if self.is_fingerprinted(file_path):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
     def wsgi_app(self, environ, start_response):
         request = Request(environ)
-        response = self.dispatch_request(request)
+        with instrument_span(self.instruments, "request", request.path):
+            response = self.dispatch_request(request)
         return response(environ, start_response)
 
     def __call__(self, environ, start_response):
         return self.wsgi_app(environ, start_response)
 
 
-def serve(**kwargs):
+def serve(*, trace=None, **kwargs):
     config = Config.load(**kwargs)
-    site = Site(config)
-    site.generate()
+    # The reloader reruns serve() in a child process; append its spans to the
+    # trace the first process started.
+    instruments = [Tracer(trace, append=is_running_from_reloader())] if trace else []
+    site = Site(config, instruments=instruments)
+    try:
+        site.generate()
+    finally:
+        site.close()
 
     extra_files = [
         path.as_posix()
@@ -62,13 +98,14 @@ def serve(**kwargs):
             config.content_dir.glob("**/*"),
             config.layouts_dir.glob("**/*"),
             config.static_dir.glob("**/*"),
+            config.data_dir.glob("**/*"),
         )
         if path.is_file()
     ]
     run_simple(
         "127.0.0.1",
         8000,
-        App(config),
+        App(config, instruments=instruments),
         use_reloader=True,
         extra_files=extra_files,
     )
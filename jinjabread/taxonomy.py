@@ -0,0 +1,172 @@
+import collections.abc
+from pathlib import Path
+import re
+
+from . import errors
+from .base import Page, PageContext
+from .utils import sort_contexts
+
+
+def slugify(text):
+    """Lowercase `text` and join its runs of letters and digits with hyphens."""
+    return re.sub(r"[^\w]+", "-", str(text).lower()).strip("-_")
+
+
+class Taxonomy:
+    """Groups a site's pages by the values of one metadata key.
+
+    Declared with a `[[taxonomies]]` entry in jinjabread.toml. A page belongs to
+    one term per value of `key` in its front matter or configured context (a
+    single value or a list), and with a `layout_name`, each term gets a
+    generated page at `path`.
+    """
+
+    def __init__(
+        self,
+        *,
+        name,
+        key=None,
+        layout_name=None,
+        path="{taxonomy}/{slug}",
+        sort="url_path",
+        reverse=False,
+    ):
+        self.name = name
+        self.key = key or name
+        self.layout_name = layout_name
+        self.path = path
+        self.sort = sort
+        self.reverse = reverse
+
+    def get_values(self, context):
+        value = context.get(self.key)
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple, set)):
+            return [str(item) for item in value]
+        return [str(value)]
+
+    def make_term_page(self, site, term):
+        page = TermPage(self, term)
+        page.setup(site, None)
+        return page
+
+    def make_terms(self, site, grouped):
+        terms = {}
+        urls = {}
+        for name in sorted(grouped):
+            pages = sort_contexts(grouped[name], self.sort, reverse=self.reverse)
+            term = {"name": name, "slug": slugify(name), "pages": pages}
+            if self.layout_name is not None:
+                term_page = self.make_term_page(site, term)
+                term["url_path"] = term_page.get_url_path()
+                term["file_path"] = term_page.get_file_path()
+                if term["url_path"] in urls:
+                    raise errors.TaxonomyError(
+                        f"Terms {urls[term['url_path']]!r} and {name!r} of "
+                        f"{self.name} share a URL: {term['url_path']}"
+                    )
+                urls[term["url_path"]] = name
+            terms[name] = term
+        return terms
+
+
+class Taxonomies(collections.abc.Mapping):
+    """Every taxonomy's terms, collected in a single pass over the site.
+
+    Maps each taxonomy's name to its terms, and each term's name to the term: a
+    dict of its `name`, `slug`, `pages` (sorted by the taxonomy's `sort`), and,
+    for taxonomies with term pages, `url_path` and `file_path`. Terms are in
+    name order. Nothing is collected until a template first reads a taxonomy,
+    and then every taxonomy is collected at once.
+    """
+
+    def __init__(self, site):
+        self._site = site
+        self._terms = None
+        self._collecting = False
+
+    def _collect(self):
+        if self._collecting:
+            raise errors.TaxonomyError(
+                "A page read taxonomies while they were being sorted by it. "
+                "List it from front matter alone with front_matter_listing."
+            )
+        if self._terms is None:
+            self._collecting = True
+            try:
+                self._terms = self._group()
+            finally:
+                self._collecting = False
+        return self._terms
+
+    def _group(self):
+        taxonomies = self._site.config.taxonomies
+        grouped = {taxonomy.name: {} for taxonomy in taxonomies}
+        for page in self._site.find_pages():
+            # Group by what the page sets without rendering it; its context is
+            # only evaluated if a template reads it.
+            metadata = page.get_metadata()
+            context = PageContext(page)
+            for taxonomy in taxonomies:
+                for value in taxonomy.get_values(metadata):
+                    grouped[taxonomy.name].setdefault(value, []).append(context)
+        return {
+            taxonomy.name: taxonomy.make_terms(self._site, grouped[taxonomy.name])
+            for taxonomy in taxonomies
+        }
+
+    def __getitem__(self, name):
+        return self._collect()[name]
+
+    def __iter__(self):
+        return iter(self._collect())
+
+    def __len__(self):
+        return len(self._collect())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TermPage(Page):
+    """The generated page that lists one term's pages."""
+
+    def __init__(self, taxonomy, term, **kwargs):
+        self.taxonomy = taxonomy
+        self.term = term
+        super().__init__(**kwargs)
+
+    def get_output_path(self):
+        directory = self.taxonomy.path.format(
+            taxonomy=self.taxonomy.name, slug=self.term["slug"]
+        )
+        return (
+            self.site.config.output_dir
+            / directory
+            / ("index" + Path(self.taxonomy.layout_name).suffix)
+        )
+
+    def get_template_name(self):
+        return self.taxonomy.layout_name
+
+    def get_context(self):
+        return self.get_default_context() | {
+            "taxonomy": self.taxonomy.name,
+            "term": self.term,
+            "pages": self.term["pages"],
+        }
+
+    def generate(self):
+        # Term pages have no content file and depend on every page's metadata,
+        # so they are always rendered.
+        with self.site.span("generate"):
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.write()
+            self.site.record_output(self.output_path)
+            self.site.record_page(self)
+
+    async def generate_async(self):
+        with self.site.span("generate"):
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            await self.write_async()
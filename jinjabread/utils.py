@@ -28,10 +28,20 @@ Segment
     runs inside them) are free to reflow.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import ctypes
+import errno
+import hashlib
 import importlib
+import os
 import re
+import shutil
+import sys
 import html
 import lxml.html
+import yaml
+
+from .errors import ShardError
 
 # HTML phrasing (inline) elements. Their contents are never reflowed and the
 # whitespace directly around them is significant, so we keep them, and any text
@@ -288,25 +298,56 @@ def render_node(node, depth):
     return "".join(parts)
 
 
+# One parser, configured once and shared by every call. Element ids are never
+# looked up, so skip building the id index for each parse.
+HTML_PARSER = lxml.html.HTMLParser(collect_ids=False)
+
+# The same test lxml.html.fromstring uses to decide that its input is a whole
+# document rather than a fragment.
+_FULL_DOCUMENT = re.compile(r"^\s*<(?:html|!doctype)", re.IGNORECASE)
+
+
+def parse_html(text):
+    """Parse `text` once and return its root, plus whether it is a document.
+
+    This resolves the document shape exactly as `lxml.html.fromstring` does: a
+    whole document, or any input the parser gave a <head> or no <body>, is a
+    document and its <html> root is returned. Anything else is a body-level
+    fragment, returned as the <body> that holds its top-level pieces. Only when
+    the parser hoisted a leading comment out of the body does the fragment need
+    a second, wrapped parse to keep that comment in place.
+    """
+    root = lxml.html.document_fromstring(text, parser=HTML_PARSER)
+    if _FULL_DOCUMENT.match(text):
+        return root, True
+    bodies = root.findall("body")
+    if root.find("head") is not None or not bodies:
+        return root, True
+    if len(bodies) > 1 or root.getprevious() is not None:
+        wrapper = lxml.html.fragment_fromstring(
+            text, create_parent="div", parser=HTML_PARSER
+        )
+        return wrapper, False
+    return bodies[0], False
+
+
 def prettify_html(text):
     """Pretty-print `text` without changing how it renders."""
     if not text:
         return ""
 
-    root = lxml.html.fromstring(text)
-    if root.tag == "html":
+    root, is_document = parse_html(text)
+    if is_document:
         # A full document, or a document-level fragment the parser promoted (for
         # example a lone <head> or <script>): emit it with a doctype, as lxml
         # resolved it. Output ends with a trailing newline, as text files should.
         return "<!DOCTYPE html>\n" + render_node(root, 0) + "\n"
 
-    # A body-level fragment. lxml.html.fromstring wraps multiple roots or
-    # leading text in a synthetic <div>/<span>; re-parse and render the
-    # top-level pieces so that injected wrapper never reaches the output. A
-    # single-rooted fragment renders identically either way.
-    wrapper = lxml.html.fragment_fromstring(text, create_parent="div")
+    # A body-level fragment. Render its top-level pieces directly so that no
+    # wrapper element (the <body>, or the <div>/<span> lxml.html.fromstring
+    # would inject) ever reaches the output.
     rendered = []
-    for kind, value in partition_into_segments(wrapper):
+    for kind, value in partition_into_segments(root):
         if kind == "block":
             rendered.append(render_node(value, 0))
         else:
@@ -316,6 +357,63 @@ def prettify_html(text):
     return "\n".join(rendered) + "\n" if rendered else ""
 
 
+def prettify_many(texts, *, jobs=1):
+    """Pretty-print every text in `texts`, yielding the results in order.
+
+    With `jobs` greater than one, the work fans out across that many worker
+    processes, each reusing its own parser; `jobs=None` uses every CPU. Results
+    are identical to calling `prettify_html` on each text in turn.
+    """
+    if jobs == 1:
+        yield from map(prettify_html, texts)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(prettify_html, texts, chunksize=16)
+
+
+def parse_shard(text):
+    """Parse a shard spec such as "2/4" into the pair (2, 4).
+
+    Shards are numbered from 1, so "2/4" is the second of four shards.
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ShardError(f"Invalid shard: {text!r} (expected I/N)") from None
+    if not 1 <= index <= count:
+        raise ShardError(f"Invalid shard: {text!r} (I must be from 1 to N)")
+    return index, count
+
+
+def shard_of(relative_path, count):
+    """Return the shard, from 1 to `count`, that builds `relative_path`.
+
+    Hashes the path rather than relying on the order of a directory walk, so
+    every machine assigns the same file to the same shard.
+    """
+    digest = hashlib.sha1(relative_path.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def sort_contexts(contexts, key, *, reverse=False):
+    """Return `contexts` sorted by the value of `key`.
+
+    Contexts without the key, or with it set to None, go last whichever way
+    the rest are sorted. Values of different types, such as dates and
+    strings, are grouped by type rather than compared.
+    """
+
+    def sort_key(context):
+        value = context[key]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return "", value
+        return type(value).__name__, value
+
+    present = [context for context in contexts if context.get(key) is not None]
+    missing = [context for context in contexts if context.get(key) is None]
+    return sorted(present, key=sort_key, reverse=reverse) + missing
+
+
 def load_page_class(dot_path):
     parts = dot_path.rsplit(".", 2)
     if len(parts) != 2:
@@ -332,3 +430,123 @@ def find_index_file(path):
     raise FileNotFoundError(
         f"Index file not found: {(path / 'index.*').relative_to(path).as_posix()}"
     )
+
+
+def parse_front_matter(lines):
+    """Return the YAML front matter at the head of `lines`, or None.
+
+    Consumes `lines` (any iterable of lines, such as an open file) only as far
+    as the closing `---` (or `...`), and parses the same block, with the same
+    loader, as the full_yaml_metadata extension.
+    """
+    lines = iter(lines)
+    if next(lines, "").rstrip("\r\n").rstrip(" ") != "---":
+        return None
+    meta_lines = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.rstrip(" ") in ("---", "..."):
+            break
+        meta_lines.append(line)
+    return yaml.load("\n".join(meta_lines), Loader=yaml.FullLoader)
+
+
+def split_front_matter(text):
+    """Split `text` into its YAML front matter (or None) and the body after it.
+
+    Recognizes the same block as `parse_front_matter`. Like the
+    full_yaml_metadata extension, an unterminated block is read as front matter
+    and also kept as the body.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines or lines[0].rstrip("\r\n").rstrip(" ") != "---":
+        return None, text
+    for index, line in enumerate(lines[1:], start=1):
+        if line.rstrip("\r\n").rstrip(" ") in ("---", "..."):
+            meta_lines, body_lines = lines[1:index], lines[index + 1 :]
+            break
+    else:
+        meta_lines = body_lines = lines[1:]
+    meta = yaml.load("".join(meta_lines), Loader=yaml.FullLoader)
+    return meta, "".join(body_lines)
+
+
+def read_front_matter(path):
+    """Return the YAML front matter of the file at `path`, reading only its head."""
+    with path.open() as file:
+        return parse_front_matter(file)
+
+
+def get_temp_path(path):
+    """A hidden path beside `path` to write its new contents to, before they are
+    moved into place in one rename."""
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def link_or_copy(source, destination):
+    """Hard-link `destination` to `source`, or copy it where links aren't
+    supported."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+# renameat2() flag and directory descriptor, from <linux/fs.h> and <fcntl.h>.
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+
+
+def exchange_paths(first, second):
+    """Swap the paths `first` and `second` in a single step, and return whether
+    they were swapped.
+
+    Uses renameat2() with RENAME_EXCHANGE, so returns False where the platform,
+    C library, or file system doesn't support it.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    renameat2 = getattr(ctypes.CDLL(None, use_errno=True), "renameat2", None)
+    if renameat2 is None:
+        return False
+    result = renameat2(
+        _AT_FDCWD,
+        os.fsencode(first),
+        _AT_FDCWD,
+        os.fsencode(second),
+        _RENAME_EXCHANGE,
+    )
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, os.strerror(error), os.fspath(first), None, os.fspath(second))
+
+
+def replace_directory(source, destination):
+    """Move the directory `source` to `destination`, replacing what was there.
+
+    Where `exchange_paths` can, the two directories are swapped in one step,
+    so readers find the old directory, whole, then the new one. Elsewhere the
+    old directory is renamed aside and `source` renamed into its place, with an
+    instant between the two renames in which there is neither.
+    """
+    old = destination.with_name(f".{destination.name}.old")
+    shutil.rmtree(old, ignore_errors=True)
+    if destination.exists() and exchange_paths(source, destination):
+        source.rename(old)
+    else:
+        if destination.exists():
+            destination.rename(old)
+        source.rename(destination)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def hash_file(path):
+    """Return the hex SHA-256 of the file at `path`."""
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
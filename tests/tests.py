@@ -1,9 +1,24 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import dataclasses
+import hashlib
+import importlib.util
+import io
+import json
 import os
 import shutil
+import subprocess
+import sys
+import threading
+import time
 import unittest
 import tempfile
 from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 from werkzeug.test import Client
+import jinja2
 
 import jinjabread
 
@@ -552,6 +567,60 @@ Just text.
                 once = jinjabread.prettify_html(text)
                 self.assertEqual(once, jinjabread.prettify_html(once))
 
+    def test_prettify_many_matches_prettify_html(self):
+        texts = [
+            "<p>a</p><p>b</p>",
+            "Leading text, then <em>inline</em>.",
+            "<html><body><p>hi</p></body></html>",
+            "<script>x = 1</script>",
+            "<!-- note --><p>after</p>",
+            "",
+        ]
+        expected = [jinjabread.prettify_html(text) for text in texts]
+        self.assertListEqual(expected, list(jinjabread.prettify_many(texts)))
+        self.assertListEqual(expected, list(jinjabread.prettify_many(texts, jobs=2)))
+
+    def test_prettify_html_unterminated_fragment_gains_no_wrapper_markup(self):
+        self.assertEqual(
+            """
+<p>
+  a
+</p>
+<script>x</script>
+""".lstrip(),
+            jinjabread.prettify_html("<p>a</p><script>x"),
+        )
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "needs renameat2()")
+    def test_exchange_paths(self):
+        Path("first").write_text("first")
+        Path("second").mkdir()
+
+        self.assertTrue(jinjabread.exchange_paths(Path("first"), Path("second")))
+
+        self.assertTrue(Path("first").is_dir())
+        self.assertEqual("first", Path("second").read_text())
+
+    def test_replace_directory(self):
+        for exchanged in (True, False):
+            with self.subTest(exchanged=exchanged):
+                Path("public").mkdir(exist_ok=True)
+                Path("public/old.txt").write_text("old")
+                Path("staging").mkdir()
+                Path("staging/new.txt").write_text("new")
+
+                with mock.patch.object(
+                    jinjabread.utils,
+                    "exchange_paths",
+                    side_effect=jinjabread.exchange_paths if exchanged else None,
+                    return_value=False,
+                ):
+                    jinjabread.replace_directory(Path("staging"), Path("public"))
+
+                self.assertEqual(["new.txt"], os.listdir("public"))
+                self.assertFalse(Path("staging").exists())
+                self.assertFalse(Path(".public.old").exists())
+
 
 class ConfigTest(TestTempWorkingDirMixin, unittest.TestCase):
 
@@ -742,6 +811,38 @@ class BuildSiteTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
 
         self.assertEqual("""Hello, World""", Path("public/home.txt").read_text())
 
+    def test_text_content_is_streamed(self):
+        content_path = self.working_dir / "content" / "feed.txt"
+        content_path.parent.mkdir(parents=True, exist_ok=True)
+        with content_path.open("w") as file:
+            file.write("""{% for i in range(3) %}line {{ i }}\n{% endfor %}""")
+
+        with mock.patch.object(
+            jinjabread.Site, "render_template", side_effect=AssertionError
+        ):
+            jinjabread.build()
+
+        self.assertEqual(
+            "line 0\nline 1\nline 2\n", Path("public/feed.txt").read_text()
+        )
+
+    def test_html_content_is_streamed_without_prettify(self):
+        with (self.working_dir / "jinjabread.toml").open("w") as file:
+            file.write("""
+                prettify_html = false
+                """)
+        content_path = self.working_dir / "content" / "home.html"
+        content_path.parent.mkdir(parents=True, exist_ok=True)
+        with content_path.open("w") as file:
+            file.write("""<h1>Hello, World{# This is a comment #}</h1>""")
+
+        with mock.patch.object(
+            jinjabread.Site, "render_template", side_effect=AssertionError
+        ):
+            jinjabread.build()
+
+        self.assertEqual("<h1>Hello, World</h1>", Path("public/home.html").read_text())
+
     def test_markdown_content(self):
         shutil.copytree(
             self.test_data_dir / "test_markdown_content",
@@ -765,6 +866,64 @@ class BuildSiteTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
             Path("public/post.html").read_text(),
         )
 
+    def test_markdown_content_without_template_syntax_skips_jinja(self):
+        content_path = self.working_dir / "content" / "post.md"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("---\nauthor: John\n---\nThe **end**.\n")
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}<p>Written by {{ author }}.</p>")
+
+        config = jinjabread.Config.load()
+        site = jinjabread.Site(config)
+        with mock.patch.object(
+            site.env, "get_template", wraps=site.env.get_template
+        ) as get_template:
+            site.generate()
+
+        self.assertListEqual([mock.call("markdown.html")], get_template.call_args_list)
+        self.assertHtmlEqual(
+            "<p>The <strong>end</strong>.</p><p>Written by John.</p>",
+            Path("public/post.html").read_text(),
+        )
+
+    def test_markdown_content_opts_out_of_jinja_in_front_matter(self):
+        content_path = self.working_dir / "content" / "post.md"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("---\njinja: false\n---\nWrite `{{ name }}`.\n")
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}")
+
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            "<p>Write <code>{{ name }}</code>.</p>",
+            Path("public/post.html").read_text(),
+        )
+
+    def test_markdown_content_opts_out_of_jinja_per_page_type(self):
+        with (self.working_dir / "jinjabread.toml").open("w") as file:
+            file.write("""
+                [[pages]]
+                  type = "jinjabread.MarkdownPage"
+                  layout_name = "markdown.html"
+                  jinja = false
+                """)
+        content_path = self.working_dir / "content" / "post.md"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("Write `{% raw %}`.\n")
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}")
+
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            "<p>Write <code>{% raw %}</code>.</p>",
+            Path("public/post.html").read_text(),
+        )
+
     def test_directory_index_html_content(self):
         content_path = self.working_dir / "content" / "posts" / "index.html"
         content_path.parent.mkdir(parents=True, exist_ok=True)
@@ -869,6 +1028,285 @@ class BuildSiteTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
             Path("public/index.html").read_text(),
         )
 
+    def test_directory_index_markdown_content_with_front_matter_listing(self):
+        shutil.copytree(
+            self.test_data_dir / "test_directory_index_markdown_content",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        with (self.working_dir / "jinjabread.toml").open("w") as file:
+            file.write("""
+                [[pages]]
+                  type = "jinjabread.MarkdownPage"
+                  layout_name = "markdown.html"
+                  front_matter_listing = true
+                """)
+
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            """
+            <header>This is a header.</header>
+            <main>
+                <h1>Look on my Works, ye Mighty, and despair!</h1>
+                <h2>Post 1</h2>
+                <p>I am post 1.</p>
+                <hr/>
+                <h2>Post 2</h2>
+                <p>I am post 2.</p>
+                <hr/>
+                <h2>Post 3</h2>
+                <p>I am post 3.</p>
+                <hr/>
+            </main>
+            <footer>This is a footer.</footer>
+            """,
+            Path("public/index.html").read_text(),
+        )
+
+    def test_front_matter_listing_skips_conversion(self):
+        with (self.working_dir / "jinjabread.toml").open("w") as file:
+            file.write("""
+                [[pages]]
+                  type = "jinjabread.MarkdownPage"
+                  layout_name = "markdown.html"
+                  front_matter_listing = true
+
+                [[pages]]
+                  type = "jinjabread.Page"
+                """)
+        content_path = self.working_dir / "content" / "posts" / "index.html"
+        content_path.parent.mkdir(parents=True)
+        content_path.touch()
+        with (content_path.parent / "post1.md").open("w") as file:
+            file.write("""---\ntitle: Post 1\ndate: 2024-01-02\n---\nI am post 1.\n""")
+
+        config = jinjabread.Config.load()
+        site = jinjabread.Site(config)
+        content_page = site.match_page(Path("content/posts/index.html"))
+        with mock.patch.object(
+            jinjabread.PythonMarkdownBackend, "convert", side_effect=AssertionError
+        ):
+            (page,) = content_page.get_context()["pages"]
+            self.assertEqual("Post 1", page["title"])
+            self.assertEqual("2024-01-02", page["date"].isoformat())
+            self.assertEqual("/posts/post1", page["url_path"])
+            self.assertNotIn("content", dict(page))
+
+        self.assertIn("content", page)
+        self.assertEqual("<p>I am post 1.</p>", page["content"])
+
+    def test_listed_paths_follow_front_matter(self):
+        content_path = self.working_dir / "content" / "blog" / "index.html"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text(
+            "{% for p in pages %}{{ p.url_path }} {{ p.title }} {{ p.url_path }}"
+            "{% endfor %}"
+        )
+        (content_path.parent / "a.md").write_text(
+            "---\ntitle: A\nurl_path: https://elsewhere.example/x\n---\nA.\n"
+        )
+
+        config = jinjabread.Config.load()
+        site = jinjabread.Site(config)
+        page = site.match_page(Path("content/blog/index.html"))
+
+        self.assertEqual(
+            "https://elsewhere.example/x A https://elsewhere.example/x",
+            page.render().strip(),
+        )
+        (listed,) = page.get_context()["pages"]
+        self.assertEqual("https://elsewhere.example/x", listed["url_path"])
+        self.assertEqual("blog/a.html", listed["file_path"])
+        self.assertEqual("A", listed["title"])
+        self.assertEqual("https://elsewhere.example/x", dict(listed)["url_path"])
+
+    def test_directory_index_evaluates_only_pages_it_reads(self):
+        content_path = self.working_dir / "content" / "posts" / "index.html"
+        content_path.parent.mkdir(parents=True)
+        with content_path.open("w") as file:
+            file.write("""
+                {% for page in (pages|sort(attribute="url_path"))[:2] %}
+                <h2>{{ page.title }}</h2>
+                {% endfor %}
+                <p>{{ pages|length }} posts</p>
+                """)
+        for number in range(1, 6):
+            with (content_path.parent / f"post{number}.md").open("w") as file:
+                file.write(f"---\ntitle: Post {number}\n---\nI am post {number}.\n")
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}")
+
+        config = jinjabread.Config.load()
+        site = jinjabread.Site(config)
+        content_page = site.match_page(Path("content/posts/index.html"))
+        with mock.patch.object(
+            jinjabread.MarkdownPage,
+            "get_listing_context",
+            autospec=True,
+            side_effect=jinjabread.MarkdownPage.get_listing_context,
+        ) as get_listing_context:
+            text = content_page.render()
+
+        self.assertEqual(2, get_listing_context.call_count)
+        self.assertHtmlEqual(
+            """
+            <h2>Post 1</h2>
+            <h2>Post 2</h2>
+            <p>5 posts</p>
+            """,
+            text,
+        )
+
+    def test_directory_index_pages_tojson(self):
+        content_path = self.working_dir / "content" / "index.txt"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("{{ pages|tojson }}")
+        (content_path.parent / "about.html").touch()
+
+        jinjabread.build()
+
+        self.assertEqual(
+            [{"file_path": "about.html", "url_path": "/about"}],
+            json.loads(Path("public/index.txt").read_text()),
+        )
+
+    def test_directory_index_paginated(self):
+        content_path = self.working_dir / "content" / "posts" / "index.html"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("""
+            <p>{{ pagination.number }} of {{ pagination.count }}</p>
+            {% for page in pages %}<h2>{{ page.title }}</h2>{% endfor %}
+            <a href="{{ pagination.previous_url }}">Newer</a>
+            <a href="{{ pagination.next_url }}">Older</a>
+            """)
+        for number in range(1, 6):
+            (content_path.parent / f"post{number}.md").write_text(
+                f"---\ntitle: Post {number}\ndate: 2024-01-0{number}\n---\nI am post {number}.\n"
+            )
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}")
+        Path("jinjabread.toml").write_text("""
+            [[pages]]
+              type = "jinjabread.MarkdownPage"
+              layout_name = "markdown.html"
+
+            [[pages]]
+              type = "jinjabread.Page"
+              paginate_by = 2
+              paginate_sort = "date"
+              paginate_reverse = true
+            """)
+
+        with mock.patch.object(
+            jinjabread.MarkdownPage,
+            "get_listing_context",
+            autospec=True,
+            side_effect=jinjabread.MarkdownPage.get_listing_context,
+        ) as get_listing_context:
+            jinjabread.build()
+
+        self.assertEqual(5, get_listing_context.call_count)
+        self.assertHtmlEqual(
+            """
+            <p>1 of 3</p>
+            <h2>Post 5</h2><h2>Post 4</h2>
+            <a href="None">Newer</a>
+            <a href="/posts/page/2/">Older</a>
+            """,
+            Path("public/posts/index.html").read_text(),
+        )
+        self.assertHtmlEqual(
+            """
+            <p>2 of 3</p>
+            <h2>Post 3</h2><h2>Post 2</h2>
+            <a href="/posts/">Newer</a>
+            <a href="/posts/page/3/">Older</a>
+            """,
+            Path("public/posts/page/2/index.html").read_text(),
+        )
+        self.assertHtmlEqual(
+            """
+            <p>3 of 3</p>
+            <h2>Post 1</h2>
+            <a href="/posts/page/2/">Newer</a>
+            <a href="None">Older</a>
+            """,
+            Path("public/posts/page/3/index.html").read_text(),
+        )
+        self.assertFalse(Path("public/posts/page/4").exists())
+
+    def test_directory_index_paginated_with_unsorted_pages(self):
+        content_path = self.working_dir / "content" / "posts" / "index.html"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text("{% for page in pages %}[{{ page.title }}]{% endfor %}")
+        for number in range(1, 3):
+            (content_path.parent / f"post{number}.md").write_text(
+                f"---\ntitle: Post {number}\ndate: 2024-01-0{number}\n---\n"
+            )
+        (content_path.parent / "post3.md").write_text(
+            "---\ntitle: Post 3\ndate: someday\n---\n"
+        )
+        (content_path.parent / "sub").mkdir()
+        (content_path.parent / "sub" / "index.md").write_text("---\ntitle: Sub\n---\n")
+        layout_path = self.working_dir / "layouts" / "markdown.html"
+        layout_path.parent.mkdir(parents=True)
+        layout_path.write_text("{{ content }}")
+        Path("jinjabread.toml").write_text("""
+            [[pages]]
+              type = "jinjabread.MarkdownPage"
+              layout_name = "markdown.html"
+
+            [[pages]]
+              type = "jinjabread.Page"
+              paginate_by = 10
+              paginate_sort = "date"
+              paginate_reverse = true
+            """)
+
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            "[Post 3][Post 2][Post 1][Sub]",
+            Path("public/posts/index.html").read_text(),
+        )
+
+    def test_directory_index_paginated_by_invalid_count(self):
+        Path("content").mkdir()
+        Path("content/index.html").write_text("{{ pages|length }}")
+        for paginate_by in ["0", "-1", '"2"']:
+            with self.subTest(paginate_by=paginate_by):
+                Path("jinjabread.toml").write_text(f"""
+                    [[pages]]
+                      type = "jinjabread.Page"
+                      paginate_by = {paginate_by}
+                    """)
+
+                with self.assertRaisesRegex(
+                    jinjabread.errors.PaginationError, "paginate_by"
+                ):
+                    jinjabread.build()
+
+    def test_directory_index_paginated_without_pages(self):
+        content_path = self.working_dir / "content" / "index.txt"
+        content_path.parent.mkdir(parents=True)
+        content_path.write_text(
+            "{{ pagination.number }} of {{ pagination.count }}: {{ pages|length }}"
+        )
+        Path("jinjabread.toml").write_text("""
+            [[pages]]
+              type = "jinjabread.Page"
+              paginate_by = 10
+              paginate_path = "archive/{number}"
+            """)
+
+        jinjabread.build()
+
+        self.assertEqual("1 of 1: 0", Path("public/index.txt").read_text())
+        self.assertFalse(Path("public/archive").exists())
+
     def test_markdown_content_with_custom_glob_pattern(self):
         shutil.copytree(
             self.test_data_dir / "test_markdown_content_with_custom_glob_pattern",
@@ -1112,6 +1550,1788 @@ class BuildSiteTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
         )
 
 
+class MarkdownCacheTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.test_data_dir = Path(__file__).parent / "test_data"
+
+    def test_disabled_by_default(self):
+        config = jinjabread.Config.load()
+        site = jinjabread.Site(config)
+
+        self.assertIsNone(site.markdown_cache)
+        self.assertFalse(config.cache_dir.exists())
+
+    def test_reuses_conversion_across_builds(self):
+        shutil.copytree(
+            self.test_data_dir / "test_markdown_content",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        with (self.working_dir / "jinjabread.toml").open("a") as file:
+            file.write("""
+                markdown_cache = true
+                """)
+
+        jinjabread.build()
+        expected = Path("public/post.html").read_text()
+        Path("public/post.html").unlink()
+        with mock.patch.object(
+            jinjabread.PythonMarkdownBackend, "convert", side_effect=AssertionError
+        ):
+            jinjabread.build()
+
+        self.assertEqual(expected, Path("public/post.html").read_text())
+        self.assertTrue((self.working_dir / ".jinjabread-cache").is_dir())
+
+    def test_build_closes_connection(self):
+        Path("content").mkdir()
+        Path("jinjabread.toml").write_text("markdown_cache = true\n")
+
+        with mock.patch.object(
+            jinjabread.MarkdownCache,
+            "close",
+            autospec=True,
+            side_effect=jinjabread.MarkdownCache.close,
+        ) as close:
+            jinjabread.build()
+
+        close.assert_called_once()
+
+    def test_key_depends_on_text_and_options(self):
+        key = jinjabread.MarkdownCache.make_key("# Hi", {"extensions": ["a"]})
+
+        self.assertEqual(
+            key, jinjabread.MarkdownCache.make_key("# Hi", {"extensions": ["a"]})
+        )
+        self.assertNotEqual(
+            key, jinjabread.MarkdownCache.make_key("# Hey", {"extensions": ["a"]})
+        )
+        self.assertNotEqual(
+            key, jinjabread.MarkdownCache.make_key("# Hi", {"extensions": ["b"]})
+        )
+
+    def test_evicts_least_recently_used(self):
+        cache = jinjabread.MarkdownCache(self.working_dir / "cache.db", max_size=1000)
+        self.addCleanup(cache.close)
+        value = ("x" * 300, {})
+
+        cache.set("one", value)
+        cache.set("two", value)
+        cache.set("three", value)
+        cache.get("one")
+        cache.set("four", value)
+
+        self.assertEqual(value, cache.get("one"))
+        self.assertIsNone(cache.get("two"))
+        self.assertEqual(value, cache.get("three"))
+        self.assertEqual(value, cache.get("four"))
+        self.assertLessEqual(cache.size, 1000)
+
+
+class MarkdownBackendTestMixin:
+    """The compatibility matrix every Markdown backend must satisfy."""
+
+    backend_name = None
+
+    def setUp(self):
+        super().setUp()
+        self.backend = jinjabread.load_markdown_backend(self.backend_name)()
+
+    def assertConverts(self, text, html, meta=None):
+        content, actual_meta = self.backend.convert(text)
+        self.assertHtmlEqual(html, content)
+        self.assertEqual(meta, actual_meta)
+
+    def test_inline_markup(self):
+        self.assertConverts(
+            "Some *emphasis*, **strong**, `code`, and a [link](/x).",
+            '<p>Some <em>emphasis</em>, <strong>strong</strong>, <code>code</code>, and a <a href="/x">link</a>.</p>',
+        )
+
+    def test_blocks(self):
+        self.assertConverts(
+            "# Title\n\n    code\n\n- one\n- two\n\n> quote\n\n---\n\nEnd",
+            """
+            <h1>Title</h1>
+            <pre><code>code\n</code></pre>
+            <ul><li>one</li><li>two</li></ul>
+            <blockquote><p>quote</p></blockquote>
+            <hr>
+            <p>End</p>
+            """,
+        )
+
+    def test_raw_html(self):
+        self.assertConverts(
+            "<div>kept</div>\n\nA <b>bold</b> &amp; plain",
+            "<div>kept</div><p>A <b>bold</b> &amp; plain</p>",
+        )
+
+    def test_front_matter(self):
+        self.assertConverts(
+            "---\ntitle: Hi\ntags: [a, b]\n---\nBody",
+            "<p>Body</p>",
+            {"title": "Hi", "tags": ["a", "b"]},
+        )
+
+    def test_front_matter_ending_with_dots(self):
+        self.assertConverts("---\ntitle: Hi\n...\nBody", "<p>Body</p>", {"title": "Hi"})
+
+    def test_empty_front_matter(self):
+        self.assertConverts("---\n---\nBody", "<p>Body</p>")
+
+    def test_only_front_matter(self):
+        self.assertConverts("---\ntitle: Hi\n---\n", "", {"title": "Hi"})
+
+    def test_no_front_matter(self):
+        self.assertConverts("Body", "<p>Body</p>")
+
+    def test_empty_text_forgets_previous_front_matter(self):
+        self.backend.convert("---\ntitle: Hi\n---\nBody")
+        self.assertConverts("", "")
+
+    def test_read_front_matter(self):
+        path = self.working_dir / "post.md"
+        path.write_text("---\ntitle: Hi\n---\nBody")
+
+        self.assertEqual({"title": "Hi"}, self.backend.read_front_matter(path))
+
+    def test_options_name_the_backend(self):
+        options = self.backend.get_options()
+
+        self.assertEqual(type(self.backend).__qualname__, options["backend"])
+        self.assertNotEqual(
+            jinjabread.MarkdownCache.make_key("Body", options),
+            jinjabread.MarkdownCache.make_key(
+                "Body", {**options, "backend": "SomeOtherBackend"}
+            ),
+        )
+
+    def test_build(self):
+        shutil.copytree(
+            Path(__file__).parent / "test_data" / "test_markdown_content",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        Path("jinjabread.toml").write_text(f"""
+            [[pages]]
+              type = "jinjabread.MarkdownPage"
+              glob_pattern = "**/*.md"
+              layout_name = "markdown.html"
+              backend = "{type(self.backend).__module__}.{type(self.backend).__qualname__}"
+
+            [[pages]]
+              type = "jinjabread.Page"
+              glob_pattern = "**/*"
+            """)
+        jinjabread.build()
+        with_backend = Path("public/post.html").read_text()
+        Path("jinjabread.toml").unlink()
+        jinjabread.build()
+
+        self.assertEqual(Path("public/post.html").read_text(), with_backend)
+
+
+class PythonMarkdownBackendTest(
+    MarkdownBackendTestMixin,
+    TestTempWorkingDirMixin,
+    TestHtmlMixin,
+    unittest.TestCase,
+):
+    backend_name = "python-markdown"
+
+    def test_is_default(self):
+        page = jinjabread.MarkdownPage(layout_name="markdown.html")
+
+        self.assertIsInstance(page.backend, jinjabread.PythonMarkdownBackend)
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("markdown_it"), "markdown-it-py is not installed"
+)
+class CommonMarkBackendTest(
+    MarkdownBackendTestMixin,
+    TestTempWorkingDirMixin,
+    TestHtmlMixin,
+    unittest.TestCase,
+):
+    backend_name = "commonmark"
+
+    def test_extensions_enable_rules(self):
+        backend = jinjabread.CommonMarkBackend(extensions=["table"])
+
+        content, _ = backend.convert("| a |\n| --- |\n| b |")
+
+        self.assertHtmlEqual(
+            "<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>b</td></tr></tbody></table>",
+            content,
+        )
+
+
+class ProfilerTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def test_nested_spans_record_exclusive_time(self):
+        profiler = jinjabread.Profiler()
+        with mock.patch("time.perf_counter", side_effect=[0.0, 1.0, 4.0, 10.0]):
+            with profiler.span("render", "index.md"):
+                with profiler.span("convert", "post.md"):
+                    pass
+
+        report = profiler.report()
+
+        self.assertEqual(10.0, report["seconds"])
+        self.assertEqual({"render": 7.0, "convert": 3.0}, report["totals"])
+        self.assertEqual(
+            [
+                {
+                    "path": "index.md",
+                    "match": 0.0,
+                    "render": 7.0,
+                    "convert": 0.0,
+                    "prettify": 0.0,
+                    "write": 0.0,
+                    "seconds": 7.0,
+                },
+                {
+                    "path": "post.md",
+                    "match": 0.0,
+                    "render": 0.0,
+                    "convert": 3.0,
+                    "prettify": 0.0,
+                    "write": 0.0,
+                    "seconds": 3.0,
+                },
+            ],
+            report["pages"],
+        )
+
+    def test_build_writes_report(self):
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        Path("static").mkdir()
+        Path("static/style.css").touch()
+
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            jinjabread.build(profile="report.json", profile_top=2)
+
+        report = json.loads(Path("report.json").read_text())
+        self.assertEqual(
+            ["index.md", "post1.md", "post2.md", "post3.md"],
+            sorted(row["path"] for row in report["pages"]),
+        )
+        for row in report["pages"]:
+            self.assertGreater(row["match"], 0)
+            self.assertGreater(row["render"], 0)
+            self.assertGreater(row["convert"], 0)
+            self.assertGreater(row["prettify"], 0)
+            self.assertGreater(row["write"], 0)
+        self.assertGreater(report["totals"]["scan"], 0)
+        self.assertGreater(report["totals"]["static"], 0)
+        self.assertAlmostEqual(report["seconds"], sum(report["totals"].values()))
+        self.assertIn("Slowest 2 of 4 pages", stdout.getvalue())
+        self.assertIn(report["pages"][0]["path"], stdout.getvalue())
+        self.assertNotIn(report["pages"][3]["path"], stdout.getvalue())
+
+
+def load_trace(path):
+    # Trace viewers accept a trace without its closing bracket; json does not.
+    return json.loads(Path(path).read_text().rstrip().removesuffix(",") + "]")
+
+
+def trace_in_worker(tracer):
+    with tracer.span("worker"):
+        pass
+    tracer.close()
+    return os.getpid()
+
+
+class TracerTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def test_build_writes_trace(self):
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        Path("static").mkdir()
+        Path("static/style.css").touch()
+
+        jinjabread.build(trace="trace.json")
+
+        events = load_trace("trace.json")
+        spans = [event for event in events if event["ph"] == "X"]
+        self.assertEqual(
+            {
+                "build",
+                "scan",
+                "match",
+                "generate",
+                "render",
+                "convert",
+                "prettify",
+                "write",
+                "static",
+            },
+            {event["name"] for event in spans},
+        )
+        self.assertEqual(
+            ["index.md", "post1.md", "post2.md", "post3.md"],
+            sorted(
+                event["args"]["path"] for event in spans if event["name"] == "generate"
+            ),
+        )
+        (build,) = [event for event in spans if event["name"] == "build"]
+        for event in spans:
+            self.assertGreaterEqual(event["ts"], build["ts"])
+            self.assertLessEqual(
+                event["ts"] + event["dur"], build["ts"] + build["dur"] + 1
+            )
+
+    def test_worker_processes_share_trace(self):
+        tracer = jinjabread.Tracer("trace.json")
+        with tracer.span("parent"):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                worker_pid = executor.submit(trace_in_worker, tracer).result()
+        tracer.close()
+
+        events = load_trace("trace.json")
+        self.assertEqual(
+            {("worker", worker_pid), ("parent", os.getpid())},
+            {(event["name"], event["pid"]) for event in events if event["ph"] == "X"},
+        )
+        self.assertEqual(
+            {worker_pid, os.getpid()},
+            {event["pid"] for event in events if event["name"] == "process_name"},
+        )
+
+    def test_append(self):
+        tracer = jinjabread.Tracer("trace.json")
+        with tracer.span("first"):
+            pass
+        tracer.close()
+        tracer = jinjabread.Tracer("trace.json", append=True)
+        with tracer.span("second"):
+            pass
+        tracer.close()
+
+        events = load_trace("trace.json")
+        self.assertEqual(
+            ["first", "second"],
+            [event["name"] for event in events if event["ph"] == "X"],
+        )
+
+    def test_serve_traces_requests(self):
+        config = jinjabread.Config.load()
+        tracer = jinjabread.Tracer("trace.json")
+        client = Client(jinjabread.App(config, instruments=[tracer]))
+
+        client.get("/missing")
+        tracer.close()
+
+        (event,) = [event for event in load_trace("trace.json") if event["ph"] == "X"]
+        self.assertEqual("request", event["name"])
+        self.assertEqual({"path": "/missing"}, event["args"])
+
+
+class ShardTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content_with_directory_siblings",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        Path("content/post2/photo.jpg").write_bytes(b"jpeg")
+        Path("content/notes.txt").write_text("Notes")
+        Path("static").mkdir()
+        Path("static/style.css").write_text("body {}")
+
+    def read_tree(self, path):
+        return {
+            file.relative_to(path).as_posix(): file.read_bytes()
+            for file in sorted(path.glob("**/*"))
+            if file.is_file() and file.name != jinjabread.SHARD_MANIFEST
+        }
+
+    def build_shards(self, count):
+        for index in range(1, count + 1):
+            jinjabread.build(shard=f"{index}/{count}")
+            Path("public").rename(f"shard{index}")
+        return [f"shard{index}" for index in range(1, count + 1)]
+
+    def test_parse_shard(self):
+        self.assertEqual((2, 4), jinjabread.parse_shard("2/4"))
+        for text in ["0/4", "5/4", "2", "a/b", "1/2/3"]:
+            with self.assertRaises(jinjabread.errors.ShardError):
+                jinjabread.parse_shard(text)
+
+    def test_shards_partition_build(self):
+        jinjabread.build()
+        expected = self.read_tree(Path("public"))
+        shutil.rmtree("public")
+
+        shard_dirs = self.build_shards(3)
+
+        written = []
+        for shard_dir in shard_dirs:
+            manifest = json.loads(
+                (Path(shard_dir) / jinjabread.SHARD_MANIFEST).read_text()
+            )
+            self.assertEqual(sorted(self.read_tree(Path(shard_dir))), manifest["files"])
+            self.assertTrue(manifest["files"])
+            written.extend(manifest["files"])
+        self.assertEqual(sorted(expected), sorted(written))
+        self.assertIn("static/style.css", self.read_tree(Path("shard1")))
+
+        jinjabread.merge(shard_dirs=shard_dirs)
+
+        self.assertEqual(expected, self.read_tree(Path("public")))
+
+    def test_merge_requires_every_shard(self):
+        shard_dirs = self.build_shards(2)
+
+        with self.assertRaises(jinjabread.errors.ShardError):
+            jinjabread.merge(shard_dirs=shard_dirs[:1])
+        with self.assertRaises(jinjabread.errors.ShardError):
+            jinjabread.merge(shard_dirs=[shard_dirs[0], *shard_dirs])
+        with self.assertRaises(jinjabread.errors.ShardError):
+            jinjabread.merge(shard_dirs=[*shard_dirs, "content"])
+
+    def test_merge_rejects_overlapping_shards(self):
+        shard_dirs = self.build_shards(2)
+        manifest_path = Path(shard_dirs[1]) / jinjabread.SHARD_MANIFEST
+        manifest = json.loads(manifest_path.read_text())
+        manifest["files"].append("static/style.css")
+        manifest_path.write_text(json.dumps(manifest))
+
+        with self.assertRaises(jinjabread.errors.ShardError) as ctx:
+            jinjabread.merge(shard_dirs=shard_dirs)
+        self.assertIn("static/style.css", str(ctx.exception))
+
+
+class PageCacheTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project_dir = self.working_dir / "project"
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content_with_directory_siblings",
+            self.project_dir,
+        )
+        (self.project_dir / "layouts" / "base.html").write_text(
+            "<main>{% block main %}{% endblock %}</main>"
+        )
+        (self.project_dir / "layouts" / "markdown.html").write_text(
+            '{% extends "base.html" %}{% block main %}{{ content }}{% endblock %}'
+        )
+        self.cache_dir = self.working_dir / "shared-cache"
+        with (self.project_dir / "jinjabread.toml").open("a") as file:
+            file.write(f"""
+page_cache = true
+page_cache_dir = "{self.cache_dir.as_posix()}"
+""")
+
+    def build(self, project_dir=None):
+        # Returns the content paths that were rendered rather than restored.
+        with mock.patch.object(
+            jinjabread.Page, "write", autospec=True, side_effect=jinjabread.Page.write
+        ) as write:
+            jinjabread.build(project_dir=project_dir or self.project_dir)
+        return sorted(
+            call.args[0]
+            .content_path.relative_to((project_dir or self.project_dir) / "content")
+            .as_posix()
+            for call in write.call_args_list
+        )
+
+    def read_tree(self, path):
+        return {
+            file.relative_to(path).as_posix(): file.read_bytes()
+            for file in sorted(path.glob("**/*"))
+            if file.is_file()
+        }
+
+    def test_disabled_by_default(self):
+        config = jinjabread.Config.load()
+
+        self.assertIsNone(jinjabread.Site(config).page_cache)
+
+    def test_fresh_checkout_reuses_pages(self):
+        pages = ["index.md", "post1/index.md", "post2/index.md", "post3/index.md"]
+        self.assertEqual(pages, self.build())
+        expected = self.read_tree(self.project_dir / "public")
+
+        checkout_dir = self.working_dir / "checkout"
+        shutil.copytree(
+            self.project_dir, checkout_dir, ignore=shutil.ignore_patterns("public")
+        )
+
+        self.assertEqual([], self.build(checkout_dir))
+        self.assertEqual(expected, self.read_tree(checkout_dir / "public"))
+
+    def test_changed_inputs_miss(self):
+        self.build()
+
+        (self.project_dir / "content" / "post2" / "index.md").write_text("Changed")
+        self.assertEqual(["index.md", "post2/index.md"], self.build())
+
+        (self.project_dir / "layouts" / "base.html").write_text(
+            "<article>{% block main %}{% endblock %}</article>"
+        )
+        self.assertEqual(
+            ["index.md", "post1/index.md", "post2/index.md", "post3/index.md"],
+            self.build(),
+        )
+
+        with (self.project_dir / "jinjabread.toml").open("a") as file:
+            file.write("""
+[context]
+  site_name = "Changed"
+""")
+        self.assertEqual(
+            ["index.md", "post1/index.md", "post2/index.md", "post3/index.md"],
+            self.build(),
+        )
+
+    def test_dynamic_template_is_not_cached(self):
+        (self.project_dir / "layouts" / "markdown.html").write_text(
+            '{% include layout_name or "base.html" %}{{ content }}'
+        )
+        (self.project_dir / "content" / "post1" / "index.md").write_text(
+            "---\nlayout_name: base.html\n---\nHi"
+        )
+        self.build()
+
+        self.assertEqual(
+            ["index.md", "post1/index.md", "post2/index.md", "post3/index.md"],
+            self.build(),
+        )
+
+
+class TaxonomyTest(TestTempWorkingDirMixin, TestHtmlMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        posts = {
+            "post1": "tags: [Python, Jinja]\ncategory: code",
+            "post2": "tags: [Python]\ncategory: code",
+            "post3": "tags: Travel\ncategory: life",
+            "post4": "title: Untagged",
+        }
+        Path("content/posts").mkdir(parents=True)
+        for name, front_matter in posts.items():
+            Path(f"content/posts/{name}.md").write_text(
+                f"---\n{front_matter}\n---\nI am {name}.\n"
+            )
+        Path("layouts").mkdir()
+        Path("layouts/markdown.html").write_text("{{ content }}")
+        Path("layouts/tag.html").write_text("""
+            <h1>{{ taxonomy }}: {{ term.name }}</h1>
+            {% for page in pages %}<a href="{{ page.url_path }}">{{ page.url_path }}</a>{% endfor %}
+            """)
+        Path("content/index.html").write_text("""
+            {% for name, term in taxonomies.tags.items() %}
+            <a href="{{ term.url_path }}">{{ name }} ({{ term.pages|length }})</a>
+            {% endfor %}
+            {% for name in taxonomies.category %}<p>{{ name }}</p>{% endfor %}
+            """)
+        Path("jinjabread.toml").write_text("""
+            [[taxonomies]]
+              name = "tags"
+              layout_name = "tag.html"
+              sort = "url_path"
+              reverse = true
+
+            [[taxonomies]]
+              name = "category"
+            """)
+
+    def test_build(self):
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            """
+            <a href="/tags/jinja/">Jinja (1)</a>
+            <a href="/tags/python/">Python (2)</a>
+            <a href="/tags/travel/">Travel (1)</a>
+            <p>code</p>
+            <p>life</p>
+            """,
+            Path("public/index.html").read_text(),
+        )
+        self.assertHtmlEqual(
+            """
+            <h1>tags: Python</h1>
+            <a href="/posts/post2">/posts/post2</a><a href="/posts/post1">/posts/post1</a>
+            """,
+            Path("public/tags/python/index.html").read_text(),
+        )
+        self.assertTrue(Path("public/tags/jinja/index.html").exists())
+        self.assertTrue(Path("public/tags/travel/index.html").exists())
+        self.assertFalse(Path("public/category").exists())
+
+    def test_collects_once_per_build(self):
+        Path("content/about.html").write_text("{{ taxonomies.tags|length }}")
+
+        with (
+            mock.patch.object(
+                jinjabread.MarkdownPage,
+                "get_metadata",
+                autospec=True,
+                side_effect=jinjabread.MarkdownPage.get_metadata,
+            ) as get_metadata,
+            mock.patch.object(
+                jinjabread.MarkdownPage,
+                "get_listing_context",
+                autospec=True,
+                side_effect=jinjabread.MarkdownPage.get_listing_context,
+            ) as get_listing_context,
+        ):
+            jinjabread.build()
+
+        self.assertEqual(4, get_metadata.call_count)
+        get_listing_context.assert_not_called()
+        self.assertEqual("3\n", Path("public/about.html").read_text())
+
+    def test_sort_without_the_key(self):
+        Path("content/posts/post1.md").write_text(
+            "---\ntags: [Python]\ndate: 2024-01-01\n---\n"
+        )
+        Path("content/posts/post4.md").write_text(
+            "---\ntags: [Python]\ndate: 2024-02-01\n---\n"
+        )
+        Path("jinjabread.toml").write_text("""
+            [[taxonomies]]
+              name = "tags"
+              layout_name = "tag.html"
+              sort = "date"
+            """)
+
+        jinjabread.build()
+
+        self.assertHtmlEqual(
+            """
+            <h1>tags: Python</h1>
+            <a href="/posts/post1">/posts/post1</a><a href="/posts/post4">/posts/post4</a><a href="/posts/post2">/posts/post2</a>
+            """,
+            Path("public/tags/python/index.html").read_text(),
+        )
+
+    def test_terms_sharing_a_url(self):
+        Path("content/posts/post4.md").write_text("---\ntags: [python]\n---\n")
+
+        with self.assertRaises(jinjabread.errors.TaxonomyError):
+            jinjabread.build()
+
+    def test_slugify(self):
+        self.assertEqual("c-c", jinjabread.slugify("C & C++"))
+        self.assertEqual("2024", jinjabread.slugify(2024))
+
+    def test_page_cache_follows_terms(self):
+        Path("content/about.txt").write_text(
+            "{{ taxonomies.tags.Travel.pages|length }}"
+        )
+        config_path = Path("jinjabread.toml")
+        config_path.write_text("page_cache = true\n" + config_path.read_text())
+        jinjabread.build()
+        self.assertEqual("1", Path("public/about.txt").read_text())
+
+        Path("content/posts/post4.md").write_text("---\ntags: [Travel]\n---\n")
+        jinjabread.build()
+
+        self.assertEqual("2", Path("public/about.txt").read_text())
+
+
+class FeedTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+    ATOM = "{http://www.w3.org/2005/Atom}"
+
+    def setUp(self):
+        super().setUp()
+        posts = {
+            "post1": "title: First\ndate: 2024-01-01",
+            "post2": "title: Second\ndate: 2024-02-01T12:00:00+02:00",
+            "post3": "title: Third & last\ndate: 2024-03-01\nsummary: The end\n"
+            "author: Ann",
+            "draft": "title: Undated",
+        }
+        Path("content/posts").mkdir(parents=True)
+        for name, front_matter in posts.items():
+            Path(f"content/posts/{name}.md").write_text(
+                f"---\n{front_matter}\n---\nI am {name}.\n"
+            )
+        Path("content/index.html").write_text("Home")
+        Path("content/robots.txt").write_text("User-agent: *")
+        Path("layouts").mkdir()
+        Path("layouts/markdown.html").write_text("{{ content }}")
+        Path("jinjabread.toml").write_text("""
+            base_url = "https://example.com/"
+            sitemap = true
+
+            [[feeds]]
+              title = "Posts"
+              glob_pattern = "posts/*.md"
+              limit = 2
+
+            [[feeds]]
+              path = "posts/rss.xml"
+              format = "rss"
+            """)
+
+    def read_sitemap(self, path):
+        root = ElementTree.parse(path).getroot()
+        return root.tag.removeprefix(self.SITEMAP), [
+            loc.text for loc in root.iter(f"{self.SITEMAP}loc")
+        ]
+
+    def test_sitemap(self):
+        jinjabread.build()
+
+        tag, urls = self.read_sitemap("public/sitemap.xml")
+        self.assertEqual("urlset", tag)
+        self.assertEqual(
+            [
+                "https://example.com/",
+                "https://example.com/posts/draft",
+                "https://example.com/posts/post1",
+                "https://example.com/posts/post2",
+                "https://example.com/posts/post3",
+            ],
+            sorted(urls),
+        )
+
+    def test_sitemap_index(self):
+        config_path = Path("jinjabread.toml")
+        config_path.write_text("sitemap_max_urls = 2\n" + config_path.read_text())
+        jinjabread.build()
+
+        tag, sitemaps = self.read_sitemap("public/sitemap.xml")
+        self.assertEqual("sitemapindex", tag)
+        self.assertEqual(
+            [f"https://example.com/sitemap-{number}.xml" for number in (1, 2, 3)],
+            sitemaps,
+        )
+        urls = []
+        for number in (1, 2, 3):
+            tag, sitemap_urls = self.read_sitemap(f"public/sitemap-{number}.xml")
+            self.assertEqual("urlset", tag)
+            self.assertLessEqual(len(sitemap_urls), 2)
+            urls.extend(sitemap_urls)
+        self.assertEqual(5, len(set(urls)))
+
+    def test_atom_feed(self):
+        jinjabread.build()
+
+        root = ElementTree.parse("public/feed.xml").getroot()
+        self.assertEqual("Posts", root.findtext(f"{self.ATOM}title"))
+        self.assertEqual(
+            "2024-03-01T00:00:00+00:00", root.findtext(f"{self.ATOM}updated")
+        )
+        entries = root.findall(f"{self.ATOM}entry")
+        self.assertEqual(
+            [
+                ("Third & last", "https://example.com/posts/post3", "The end", "Ann"),
+                ("Second", "https://example.com/posts/post2", None, None),
+            ],
+            [
+                (
+                    entry.findtext(f"{self.ATOM}title"),
+                    entry.findtext(f"{self.ATOM}id"),
+                    entry.findtext(f"{self.ATOM}summary"),
+                    entry.findtext(f"{self.ATOM}author/{self.ATOM}name"),
+                )
+                for entry in entries
+            ],
+        )
+        self.assertEqual("Posts", root.findtext(f"{self.ATOM}author/{self.ATOM}name"))
+
+    def test_empty_atom_feed_is_deterministic(self):
+        config_path = Path("jinjabread.toml")
+        config_path.write_text(
+            config_path.read_text()
+            + '\n[[feeds]]\n  path = "empty.xml"\n  glob_pattern = "none/*"\n'
+            '  author = "Ann"\n'
+        )
+        jinjabread.build()
+        first = Path("public/empty.xml").read_text()
+
+        jinjabread.build()
+
+        self.assertEqual(first, Path("public/empty.xml").read_text())
+        root = ElementTree.fromstring(first)
+        self.assertEqual(
+            "1970-01-01T00:00:00+00:00", root.findtext(f"{self.ATOM}updated")
+        )
+        self.assertEqual("Ann", root.findtext(f"{self.ATOM}author/{self.ATOM}name"))
+
+    def test_rss_feed(self):
+        jinjabread.build()
+
+        channel = ElementTree.parse("public/posts/rss.xml").getroot().find("channel")
+        self.assertEqual("https://example.com/", channel.findtext("title"))
+        self.assertEqual(
+            [
+                ("Third & last", "Fri, 01 Mar 2024 00:00:00 +0000"),
+                ("Second", "Thu, 01 Feb 2024 12:00:00 +0200"),
+                ("First", "Mon, 01 Jan 2024 00:00:00 +0000"),
+            ],
+            [
+                (item.findtext("title"), item.findtext("pubDate"))
+                for item in channel.findall("item")
+            ],
+        )
+
+    def test_requires_base_url(self):
+        config_path = Path("jinjabread.toml")
+        config_path.write_text(
+            config_path.read_text().replace("https://example.com/", "")
+        )
+
+        with self.assertRaises(jinjabread.errors.FeedError):
+            jinjabread.build()
+
+    def test_invalid_date(self):
+        Path("content/posts/post1.md").write_text("---\ndate: someday\n---\n")
+
+        with self.assertRaises(jinjabread.errors.FeedError):
+            jinjabread.build()
+
+    def test_failed_build_removes_sitemap(self):
+        Path("content/posts/post1.md").write_text("---\ndate: someday\n---\n")
+
+        with self.assertRaises(jinjabread.errors.FeedError):
+            jinjabread.build()
+
+        self.assertEqual([], list(Path("public").glob("*sitemap*")))
+
+    def test_entries_render_pages_once(self):
+        with mock.patch.object(
+            jinjabread.MarkdownPage,
+            "get_context",
+            autospec=True,
+            side_effect=jinjabread.MarkdownPage.get_context,
+        ) as get_context:
+            jinjabread.build()
+
+        self.assertEqual(4, get_context.call_count)
+
+    def test_shards_merge_sitemap_and_feeds(self):
+        jinjabread.build()
+        expected_urls = sorted(self.read_sitemap("public/sitemap.xml")[1])
+        expected_feeds = {
+            name: Path("public", name).read_text()
+            for name in ["feed.xml", "posts/rss.xml"]
+        }
+        shutil.rmtree("public")
+
+        shard_dirs = []
+        for index in (1, 2):
+            jinjabread.build(shard=f"{index}/2")
+            Path("public").rename(f"shard{index}")
+            shard_dirs.append(f"shard{index}")
+        jinjabread.merge(shard_dirs=shard_dirs)
+
+        tag, sitemaps = self.read_sitemap("public/sitemap.xml")
+        self.assertEqual("sitemapindex", tag)
+        urls = []
+        for sitemap in sitemaps:
+            path = Path("public") / sitemap.removeprefix("https://example.com/")
+            urls.extend(self.read_sitemap(path)[1])
+        self.assertEqual(expected_urls, sorted(urls))
+        for name, text in expected_feeds.items():
+            self.assertEqual(text, Path("public", name).read_text())
+
+
+class OutputWriteTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Path("content").mkdir()
+        Path("content/index.html").write_text("Home")
+        Path("content/about.html").write_text("About {{ name }}")
+        Path("content/photo.jpg").write_bytes(b"jpeg")
+        Path("static").mkdir()
+        Path("static/style.css").write_text("body {}")
+        self.config_path = Path("jinjabread.toml")
+        self.config_path.write_text('[context]\n  name = "me"\n')
+
+    def read_stats(self):
+        return {
+            path.relative_to("public").as_posix(): (
+                path.stat().st_ino,
+                path.stat().st_mtime_ns,
+            )
+            for path in sorted(Path("public").glob("**/*"))
+            if path.is_file()
+        }
+
+    def age_outputs(self):
+        for path in Path("public").glob("**/*"):
+            if path.is_file():
+                os.utime(path, ns=(0, 0))
+
+    def test_skips_unchanged_outputs(self):
+        jinjabread.build()
+        self.age_outputs()
+        before = self.read_stats()
+
+        Path("content/about.html").write_text("About {{ name }}!")
+        jinjabread.build()
+
+        after = self.read_stats()
+        self.assertEqual(sorted(before), sorted(after))
+        for name in ["index.html", "photo.jpg", "static/style.css"]:
+            self.assertEqual(before[name], after[name], name)
+        self.assertNotEqual(before["about.html"][1], after["about.html"][1])
+        self.assertEqual("About me!\n", Path("public/about.html").read_text())
+        self.assertEqual(
+            [], [path for path in Path("public").glob("**/.*") if path.is_file()]
+        )
+
+    def test_failed_write_leaves_previous_output(self):
+        # Text output is streamed to disk as it renders.
+        Path("content/notes.txt").write_text("Notes for {{ name }}")
+        jinjabread.build()
+        Path("content/notes.txt").write_text(
+            "Notes for {{ name }} {{ name.missing() }}"
+        )
+
+        with self.assertRaises(jinja2.exceptions.UndefinedError):
+            jinjabread.build()
+
+        self.assertEqual("Notes for me", Path("public/notes.txt").read_text())
+        self.assertEqual(
+            [], [path for path in Path("public").glob("**/.*") if path.is_file()]
+        )
+
+    def test_staged_output(self):
+        self.config_path.write_text(
+            "staged_output = true\n" + self.config_path.read_text()
+        )
+        jinjabread.build()
+        self.age_outputs()
+        before = self.read_stats()
+
+        Path("content/about.html").unlink()
+        Path("content/contact.html").write_text("Contact")
+        jinjabread.build()
+
+        after = self.read_stats()
+        self.assertEqual(
+            ["contact.html", "index.html", "photo.jpg", "static/style.css"],
+            sorted(after),
+        )
+        for name in ["index.html", "photo.jpg", "static/style.css"]:
+            self.assertEqual(before[name], after[name], name)
+        self.assertEqual(["public"], [path.name for path in Path(".").glob("*public*")])
+
+    def test_failed_staged_build_leaves_previous_output(self):
+        self.config_path.write_text(
+            "staged_output = true\n" + self.config_path.read_text()
+        )
+        jinjabread.build()
+        before = self.read_stats()
+        Path("content/contact.html").write_text("Contact")
+        Path("content/about.html").write_text("About {{ name.missing() }}")
+
+        with self.assertRaises(jinja2.exceptions.UndefinedError):
+            jinjabread.build()
+
+        self.assertEqual(before, self.read_stats())
+
+
+class DeployManifestTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Path("content/posts").mkdir(parents=True)
+        Path("content/index.html").write_text("Home")
+        Path("content/posts/about.html").write_text("About")
+        Path("content/photo.jpg").write_bytes(b"jpeg")
+
+    def read_changes(self, manifest):
+        return {
+            key: [(entry["path"], entry["url_path"]) for entry in manifest[key]]
+            for key in ["added", "changed", "removed"]
+        }
+
+    def test_build(self):
+        jinjabread.build(deploy_manifest="deploy.json")
+        manifest = json.loads(Path("deploy.json").read_text())
+
+        self.assertEqual(
+            {
+                "added": [
+                    ("index.html", "/"),
+                    ("photo.jpg", "/photo.jpg"),
+                    ("posts/about.html", "/posts/about"),
+                ],
+                "changed": [],
+                "removed": [],
+            },
+            self.read_changes(manifest),
+        )
+        self.assertEqual(
+            hashlib.sha256(b"jpeg").hexdigest(),
+            manifest["files"]["photo.jpg"]["sha256"],
+        )
+
+        Path("content/posts/about.html").write_text("About us")
+        Path("content/photo.jpg").unlink()
+        Path("content/contact.html").write_text("Contact")
+        jinjabread.build(deploy_manifest="deploy.json")
+        manifest = json.loads(Path("deploy.json").read_text())
+
+        self.assertEqual(
+            {
+                "added": [("contact.html", "/contact")],
+                "changed": [("posts/about.html", "/posts/about")],
+                "removed": [("photo.jpg", "/photo.jpg")],
+            },
+            self.read_changes(manifest),
+        )
+        self.assertEqual(
+            ["contact.html", "index.html", "posts/about.html"],
+            sorted(manifest["files"]),
+        )
+
+        jinjabread.build(deploy_manifest="deploy.json")
+        manifest = json.loads(Path("deploy.json").read_text())
+
+        self.assertEqual(
+            {"added": [], "changed": [], "removed": []}, self.read_changes(manifest)
+        )
+
+    def test_merge(self):
+        jinjabread.build(deploy_manifest="deploy.json")
+        expected = json.loads(Path("deploy.json").read_text())["added"]
+        shutil.rmtree("public")
+        Path("deploy.json").unlink()
+
+        for index in (1, 2):
+            jinjabread.build(shard=f"{index}/2")
+            Path("public").rename(f"shard{index}")
+        jinjabread.merge(shard_dirs=["shard1", "shard2"], deploy_manifest="deploy.json")
+
+        self.assertEqual(expected, json.loads(Path("deploy.json").read_text())["added"])
+
+
+class AssetTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Path("content").mkdir()
+        Path("content/index.html").write_text(
+            '{{ asset("app.css") }} {{ "fonts/icons.woff"|asset }}'
+        )
+        Path("static/fonts").mkdir(parents=True)
+        Path("static/app.css").write_text("body {}")
+        Path("static/fonts/icons.woff").write_bytes(b"woff")
+        self.config_path = Path("jinjabread.toml")
+        self.config_path.write_text("fingerprint_static = true\n")
+        self.app_css = f"app.{hashlib.sha256(b'body {}').hexdigest()[:8]}.css"
+        self.icons_woff = f"icons.{hashlib.sha256(b'woff').hexdigest()[:8]}.woff"
+
+    def test_unfingerprinted(self):
+        self.config_path.write_text("")
+        jinjabread.build()
+
+        self.assertEqual(
+            "/static/app.css /static/fonts/icons.woff",
+            Path("public/index.html").read_text().strip(),
+        )
+        self.assertFalse(Path("public/static", jinjabread.ASSET_MANIFEST).exists())
+
+    def test_fingerprinted(self):
+        jinjabread.build()
+
+        self.assertEqual(
+            f"/static/{self.app_css} /static/fonts/{self.icons_woff}",
+            Path("public/index.html").read_text().strip(),
+        )
+        self.assertEqual(
+            {
+                "app.css": self.app_css,
+                "fonts/icons.woff": f"fonts/{self.icons_woff}",
+            },
+            json.loads(Path("public/static", jinjabread.ASSET_MANIFEST).read_text()),
+        )
+        for name in [
+            "app.css",
+            self.app_css,
+            "fonts/icons.woff",
+            f"fonts/{self.icons_woff}",
+        ]:
+            self.assertTrue(Path("public/static", name).is_file(), name)
+
+    def test_missing_asset(self):
+        Path("content/index.html").write_text('{{ asset("missing.css") }}')
+
+        with self.assertRaises(jinjabread.errors.AssetNotFoundError):
+            jinjabread.build()
+
+    def test_page_cache_follows_assets(self):
+        self.config_path.write_text(
+            "page_cache = true\n" + self.config_path.read_text()
+        )
+        jinjabread.build()
+
+        Path("static/app.css").write_text("body { margin: 0 }")
+        jinjabread.build()
+
+        app_css = hashlib.sha256(b"body { margin: 0 }").hexdigest()[:8]
+        self.assertIn(
+            f"/static/app.{app_css}.css", Path("public/index.html").read_text()
+        )
+
+    def test_serve_caches_fingerprinted_files(self):
+        jinjabread.build()
+        client = Client(jinjabread.App(jinjabread.Config.load()))
+
+        response = client.get(f"/static/{self.app_css}")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            "public, max-age=31536000, immutable", response.headers["Cache-Control"]
+        )
+        response = client.get("/static/app.css")
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn("Cache-Control", response.headers)
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    HEAVY_MODULES = {"jinja2", "markdown", "markdown_it", "lxml", "yaml", "werkzeug"}
+
+    def import_modules(self, *args):
+        # The top-level packages `python -X importtime` reports importing.
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=tempfile.gettempdir(),
+            env=os.environ | {"PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+        return {
+            line.rpartition("|")[2].strip().split(".")[0]
+            for line in completed.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+
+    def test_import(self):
+        modules = self.import_modules("-c", "import jinjabread")
+
+        self.assertIn("jinjabread", modules)
+        self.assertEqual(set(), modules & self.HEAVY_MODULES)
+
+    def test_help(self):
+        modules = self.import_modules("-m", "jinjabread", "--help")
+
+        self.assertEqual(set(), modules & self.HEAVY_MODULES)
+
+    def test_new(self):
+        with tempfile.TemporaryDirectory() as project_dir:
+            modules = self.import_modules(
+                "-m", "jinjabread", "new", str(Path(project_dir) / "mysite")
+            )
+
+        self.assertEqual(set(), modules & self.HEAVY_MODULES)
+
+    def test_daemon_client(self):
+        modules = self.import_modules("-c", "import jinjabread.daemon")
+
+        self.assertEqual(set(), modules & self.HEAVY_MODULES)
+
+    def test_exports(self):
+        for name in jinjabread.__all__:
+            self.assertTrue(hasattr(jinjabread, name), name)
+        for name in ["new", "build", "merge", "serve"]:
+            self.assertTrue(callable(getattr(jinjabread, name)), name)
+        self.assertIsInstance(jinjabread.errors.Error, type)
+
+    def test_exports_after_submodule_imports(self):
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import jinjabread\n"
+                "jinjabread.serve\n"
+                "from jinjabread.serve import App\n"
+                "from jinjabread.build import build\n"
+                "import jinjabread.new, jinjabread.merge\n"
+                "for name in ['new', 'build', 'merge', 'serve']:\n"
+                "    assert callable(getattr(jinjabread, name)), name\n"
+                "assert jinjabread.App is App\n",
+            ],
+            check=True,
+            cwd=tempfile.gettempdir(),
+            env=os.environ | {"PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+
+
+class MemoryBuildTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content_with_directory_siblings",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        Path("content/post2/photo.jpg").write_bytes(b"jpeg")
+        Path("static").mkdir()
+        Path("static/style.css").write_text("body {}")
+        Path("jinjabread.toml").write_text("fingerprint_static = true\n")
+        self.files = {
+            path.as_posix(): (
+                path.read_bytes() if path.suffix == ".jpg" else path.read_text()
+            )
+            for path in sorted(Path(".").glob("**/*"))
+            if path.is_file()
+        }
+
+    def test_matches_build(self):
+        jinjabread.build()
+        expected = {
+            path.relative_to("public").as_posix(): (
+                path.read_bytes()
+                if path.suffix in (".jpg", ".css")
+                else path.read_text()
+            )
+            for path in sorted(Path("public").glob("**/*"))
+            if path.is_file()
+        }
+        shutil.rmtree("public")
+
+        self.assertEqual(expected, jinjabread.build_in_memory(self.files))
+        self.assertFalse(Path("public").exists())
+
+    def test_loader(self):
+        outputs = jinjabread.build_in_memory(
+            self.files,
+            loader=jinja2.DictLoader({"markdown.html": "Preview: {{ title }}"}),
+        )
+
+        self.assertEqual("Preview: Post 1", outputs["post1/index.html"].strip())
+
+    def test_virtual_paths_stay_in_memory(self):
+        root = jinjabread.VirtualPath.make_root({"content/index.md": "Home"})
+
+        self.assertEqual(["content"], [path.name for path in root.iterdir()])
+        self.assertEqual("Home", (root / "content/index.md").read_text())
+        with self.assertRaises(TypeError):
+            os.fspath(root / "content/index.md")
+
+
+class DaemonTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content_with_directory_siblings",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+        self.server = jinjabread.DaemonServer(jinjabread.DAEMON_SOCKET)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.shutdown)
+
+    def read_outputs(self):
+        return {
+            path.as_posix(): path.read_text()
+            for path in sorted(Path("public").glob("**/*"))
+            if path.is_file()
+        }
+
+    def test_matches_build(self):
+        jinjabread.build()
+        expected = self.read_outputs()
+        shutil.rmtree("public")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            done = jinjabread.request_build()
+
+        self.assertEqual(expected, self.read_outputs())
+        self.assertEqual(len(expected), done["files"])
+
+    def test_streams_pages(self):
+        events = []
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            jinjabread.request_build(on_event=events.append)
+
+        self.assertEqual(
+            [
+                "index.md",
+                "post1/index.md",
+                "post2/index.md",
+                "post3/index.md",
+            ],
+            sorted(event["path"] for event in events),
+        )
+        self.assertRegex(stdout.getvalue(), r"^Built 4 files in \d+\.\d\ds\n$")
+
+    def test_keeps_site_warm(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            jinjabread.request_build()
+            (site,) = [site for site, _ in self.server.sites.values()]
+            Path("content/post1/index.md").write_text("# Changed")
+            jinjabread.request_build()
+
+        self.assertEqual([site], [site for site, _ in self.server.sites.values()])
+        self.assertIn("Changed", Path("public/post1/index.html").read_text())
+
+    def test_reloads_config(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            jinjabread.request_build()
+            (site,) = [site for site, _ in self.server.sites.values()]
+            Path("jinjabread.toml").write_text('output_dir = "dist"\n')
+            with mock.patch.object(
+                jinjabread.Site,
+                "close",
+                autospec=True,
+                side_effect=jinjabread.Site.close,
+            ) as close:
+                jinjabread.request_build()
+
+        self.assertTrue(Path("dist/post1/index.html").exists())
+        close.assert_called_once_with(site)
+
+    def test_build_error(self):
+        Path("layouts/markdown.html").write_text("{% if %}")
+
+        with self.assertRaisesRegex(jinjabread.errors.DaemonError, "TemplateSyntax"):
+            jinjabread.request_build()
+
+        # The daemon keeps serving after a failed build.
+        Path("layouts/markdown.html").write_text("{{ content }}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            jinjabread.request_build()
+        self.assertTrue(Path("public/post1/index.html").exists())
+
+    def test_command(self):
+        completed = subprocess.run(
+            [sys.executable, "-m", "jinjabread", "build", ".", "--daemon"],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=os.environ | {"PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+
+        *paths, summary = completed.stdout.splitlines()
+        self.assertEqual(
+            ["index.md", "post1/index.md", "post2/index.md", "post3/index.md"],
+            sorted(paths),
+        )
+        self.assertTrue(summary.startswith("Built 4 files in "))
+        self.assertTrue(Path("public/post1/index.html").exists())
+
+    def test_rejects_profiling(self):
+        with self.assertRaisesRegex(jinjabread.errors.DaemonError, "profile"):
+            jinjabread.request_build(profile="profile.json")
+
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "jinjabread",
+                "build",
+                ".",
+                "--daemon",
+                "--trace",
+                "t",
+            ],
+            capture_output=True,
+            text=True,
+            env=os.environ | {"PYTHONPATH": str(Path(__file__).parent.parent)},
+        )
+
+        self.assertEqual(2, completed.returncode)
+        self.assertIn("--trace can't be used with --daemon", completed.stderr)
+        self.assertFalse(Path("t").exists())
+
+    def test_no_daemon(self):
+        Path("other").mkdir()
+
+        with self.assertRaisesRegex(jinjabread.errors.DaemonError, "No daemon"):
+            jinjabread.request_build(project_dir="other")
+
+    def test_already_running(self):
+        with self.assertRaisesRegex(jinjabread.errors.DaemonError, "already"):
+            jinjabread.DaemonServer(jinjabread.DAEMON_SOCKET)
+
+
+class AsyncRenderTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        shutil.copytree(
+            Path(__file__).parent
+            / "test_data"
+            / "test_directory_index_markdown_content_with_directory_siblings",
+            self.working_dir,
+            dirs_exist_ok=True,
+        )
+
+    def read_outputs(self):
+        return {
+            path.as_posix(): path.read_text()
+            for path in sorted(Path("public").glob("**/*"))
+            if path.is_file()
+        }
+
+    def make_site(self, **kwargs):
+        config = jinjabread.Config.load()
+        return jinjabread.Site(dataclasses.replace(config, **kwargs))
+
+    def test_matches_sync_build(self):
+        Path("jinjabread.toml").write_text(
+            'base_url = "https://example.com"\nsitemap = true\n'
+        )
+        jinjabread.build()
+        expected = self.read_outputs()
+        shutil.rmtree("public")
+        Path("jinjabread.toml").write_text(
+            'base_url = "https://example.com"\nsitemap = true\nasync_render = true\n'
+        )
+
+        jinjabread.build()
+
+        self.assertEqual(expected, self.read_outputs())
+
+    def test_pages_await_loaders_concurrently(self):
+        for number in range(4):
+            Path(f"content/page{number}.html").write_text(
+                f"{{{{ load('page{number}') }}}}"
+            )
+        site = self.make_site(async_render=True)
+        started = set()
+
+        async def load(name):
+            # Returns only once every page has started loading, which it can't
+            # if the pages render one after another.
+            started.add(name)
+            deadline = time.monotonic() + 5
+            while len(started) < 4 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            return f"{name} of {len(started)}"
+
+        site.env.globals["load"] = load
+        site.generate()
+
+        for number in range(4):
+            self.assertEqual(
+                f"page{number} of 4\n", Path(f"public/page{number}.html").read_text()
+            )
+
+    def test_listed_pages_await_loaders(self):
+        Path("content/post1/index.md").write_text("# {{ load('Post 1') }}")
+        site = self.make_site(async_render=True)
+
+        async def load(name):
+            await asyncio.sleep(0)
+            return name.upper()
+
+        site.env.globals["load"] = load
+        site.generate()
+
+        self.assertIn("POST 1", Path("public/post1/index.html").read_text())
+        self.assertIn("POST 1", Path("public/index.html").read_text())
+
+    def test_nested_listings(self):
+        listing = "{% for page in pages %}{{ page.content }}{% endfor %}"
+        Path("content/index.md").write_text(listing)
+        Path("content/post1/index.md").write_text(listing)
+        Path("content/post1/post.md").write_text("Hello {{ url_path }}")
+        jinjabread.build()
+        expected = self.read_outputs()
+        shutil.rmtree("public")
+        Path("jinjabread.toml").write_text("async_render = true\n")
+
+        # A build that deadlocks never finishes, so wait for it on a thread.
+        thread = threading.Thread(target=jinjabread.build, daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(expected, self.read_outputs())
+        self.assertIn("Hello /post1/post", expected["public/index.html"])
+
+    def test_failed_page_cancels_others(self):
+        Path("content/fail.html").write_text("{{ fail() }}")
+        Path("content/slow.html").write_text("{{ wait() }}")
+        site = self.make_site(async_render=True)
+        cancelled = []
+
+        async def fail():
+            raise ValueError("fail")
+
+        async def wait():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append("slow")
+                raise
+
+        site.env.globals.update(fail=fail, wait=wait)
+        pages = [
+            site.match_page(Path("content/fail.html")),
+            site.match_page(Path("content/slow.html")),
+        ]
+
+        async def generate():
+            with self.assertRaises(ValueError):
+                await site.generate_pages_async(pages)
+            # The cancelled page finished before generate_pages_async returned.
+            return list(cancelled)
+
+        self.assertEqual(["slow"], asyncio.run(generate()))
+        self.assertEqual([], list(Path("public").glob("**/*.tmp")))
+
+    def test_build_shuts_down_render_thread(self):
+        Path("jinjabread.toml").write_text("async_render = true\n")
+
+        with mock.patch.object(
+            concurrent.futures.ThreadPoolExecutor,
+            "shutdown",
+            autospec=True,
+            side_effect=concurrent.futures.ThreadPoolExecutor.shutdown,
+        ) as shutdown:
+            jinjabread.build()
+
+        shutdown.assert_called_once()
+
+    def test_outputs_in_order(self):
+        site = self.make_site(async_render=True, async_concurrency=2)
+        site.generate()
+        async_outputs = site.outputs
+
+        site = self.make_site()
+        site.generate()
+
+        self.assertEqual(site.outputs, async_outputs)
+
+
+class DataTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Path("content").mkdir()
+        Path("data/shop").mkdir(parents=True)
+        Path("data/authors.json").write_text('{"me": {"name": "Me"}}')
+        Path("data/site.toml").write_text('title = "My site"')
+        Path("data/shop/products.csv").write_text("name,price\nTea,3\nCake,4\n")
+        Path("data/notes.txt").write_text("Not data.")
+
+    def make_site(self, **kwargs):
+        config = jinjabread.Config.load()
+        return jinjabread.Site(dataclasses.replace(config, **kwargs))
+
+    def test_templates_read_data(self):
+        Path("content/index.html").write_text(
+            "{{ data.site.title }} by {{ data.authors.me.name }}:"
+            "{% for product in data.shop.products %} {{ product.name }}"
+            " ({{ product.price }}){% endfor %}"
+        )
+
+        jinjabread.build()
+
+        self.assertEqual(
+            "My site by Me: Tea (3) Cake (4)\n",
+            Path("public/index.html").read_text(),
+        )
+
+    def test_names(self):
+        data = jinjabread.DataDirectory(Path("data"))
+
+        self.assertEqual(["authors", "shop", "site"], list(data))
+        self.assertEqual(["products"], list(data["shop"]))
+        self.assertNotIn("notes", data)
+
+    def test_files_parsed_once_when_read(self):
+        for name in ("page1", "page2", "page3"):
+            Path(f"content/{name}.html").write_text("{{ data.authors.me.name }}")
+        load_json = mock.Mock(side_effect=jinjabread.load_json)
+        load_toml = mock.Mock(side_effect=jinjabread.load_toml)
+
+        with mock.patch.dict(
+            jinjabread.DATA_LOADERS, {".json": load_json, ".toml": load_toml}
+        ):
+            site = self.make_site()
+            site.generate()
+            self.assertEqual(1, load_json.call_count)
+            self.assertEqual(0, load_toml.call_count)
+
+            site.generate()
+            self.assertEqual(2, load_json.call_count)
+
+    def test_rebuild_reads_changes(self):
+        Path("content/index.html").write_text("{{ data.site.title }}")
+        site = self.make_site(page_cache=True)
+        site.generate()
+
+        Path("data/site.toml").write_text('title = "Renamed"')
+        site.generate()
+
+        self.assertEqual("Renamed\n", Path("public/index.html").read_text())
+
+    def test_same_name(self):
+        Path("data/authors.toml").write_text("")
+        Path("content/index.html").write_text("{{ data.authors }}")
+
+        with self.assertRaisesRegex(jinjabread.errors.DataError, "same name"):
+            jinjabread.build()
+
+    def test_invalid_file(self):
+        Path("data/authors.json").write_text("{")
+        Path("content/index.html").write_text("{{ data.authors }}")
+
+        with self.assertRaisesRegex(
+            jinjabread.errors.DataError, "Invalid data file .*authors.json"
+        ):
+            jinjabread.build()
+
+    def test_in_memory(self):
+        outputs = jinjabread.build_in_memory(
+            {
+                "content/index.html": "{{ data.site.title }}",
+                "data/site.toml": 'title = "In memory"',
+            }
+        )
+
+        self.assertEqual("In memory\n", outputs["index.html"])
+
+
+class FragmentCacheTest(TestTempWorkingDirMixin, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Path("content").mkdir()
+        Path("layouts").mkdir()
+        Path("layouts/nav.html").write_text(
+            '{% cache "nav" %}<nav>{{ render_nav() }}</nav>{% endcache %}'
+            "{% cache url_path %}<h1>{{ render_title(url_path) }}</h1>{% endcache %}"
+        )
+        for name in ("page1", "page2", "page3"):
+            Path(f"content/{name}.html").write_text(
+                f'{{% include "nav.html" %}}<p>{name}</p>'
+            )
+        self.renders = []
+
+    def render_nav(self):
+        self.renders.append("nav")
+        return "Menu"
+
+    def render_title(self, url_path):
+        self.renders.append(url_path)
+        return url_path
+
+    def build(self, **kwargs):
+        config = dataclasses.replace(jinjabread.Config.load(), **kwargs)
+        site = jinjabread.Site(config)
+        site.env.globals["render_nav"] = self.render_nav
+        site.env.globals["render_title"] = self.render_title
+        site.generate()
+        return site
+
+    def test_renders_once_per_key(self):
+        self.build(prettify_html=False)
+
+        self.assertEqual(["/page1", "/page2", "/page3", "nav"], sorted(self.renders))
+        self.assertEqual(
+            "<nav>Menu</nav><h1>/page2</h1><p>page2</p>",
+            Path("public/page2.html").read_text(),
+        )
+
+    def test_async_render(self):
+        self.build(prettify_html=False, async_render=True)
+
+        self.assertEqual(["/page1", "/page2", "/page3", "nav"], sorted(self.renders))
+        self.assertEqual(
+            "<nav>Menu</nav><h1>/page2</h1><p>page2</p>",
+            Path("public/page2.html").read_text(),
+        )
+
+    def test_renders_once_per_build(self):
+        site = self.build()
+        self.renders.clear()
+
+        site.generate()
+
+        self.assertIn("nav", self.renders)
+
+    def test_kept_across_builds_with_page_cache(self):
+        self.build(page_cache=True)
+        self.renders.clear()
+        Path("content/page2.html").write_text('{% include "nav.html" %}<p>New</p>')
+
+        self.build(page_cache=True)
+
+        self.assertEqual([], self.renders)
+        self.assertIn("Menu", Path("public/page2.html").read_text())
+        self.assertIn("New", Path("public/page2.html").read_text())
+
+    def test_content_change_misses_when_listing_pages(self):
+        Path("content/blog").mkdir()
+        Path("content/blog/index.html").write_text(
+            '{% cache "recent" %}'
+            "{% for p in pages %}[{{ p.url_path }}]{% endfor %}"
+            "{% endcache %}"
+        )
+        Path("content/blog/a.html").write_text("A")
+        self.build(page_cache=True, prettify_html=False)
+        self.assertEqual("[/blog/a]", Path("public/blog/index.html").read_text())
+
+        Path("content/blog/b.html").write_text("B")
+        self.build(page_cache=True, prettify_html=False)
+
+        self.assertEqual(
+            "[/blog/a][/blog/b]", Path("public/blog/index.html").read_text()
+        )
+
+    def test_template_change_misses(self):
+        self.build(page_cache=True)
+        self.renders.clear()
+        Path("layouts/nav.html").write_text(
+            '{% cache "nav" %}<ul>{{ render_nav() }}</ul>{% endcache %}'
+        )
+
+        self.build(page_cache=True)
+
+        self.assertEqual(["nav"], self.renders)
+        self.assertIn("<ul>", Path("public/page1.html").read_text())
+
+    def test_without_site(self):
+        env = jinja2.Environment(extensions=[jinjabread.FragmentCacheExtension])
+        template = env.from_string('{% cache "key" %}{{ render_nav() }}{% endcache %}')
+
+        for _ in range(2):
+            self.assertEqual("Menu", template.render(render_nav=self.render_nav))
+
+        self.assertEqual(["nav", "nav"], self.renders)
+
+
 class NewSiteTest(TestTempWorkingDirMixin, unittest.TestCase):
 
     def test_defaults(self):